@@ -0,0 +1,112 @@
+"""Compare ASR backends and Whisper model sizes on recorded calls
+
+Run from the repository root with: python -m benchmarks.bench_asr
+Every outputs/phone_calls/*/output.wav is resampled to 16kHz, cut into 30 second
+windows and decoded with transcribe_batch by each backend and model. Real-time
+factor is decode seconds per second of audio (below 1 keeps up with a call).
+Word error rate is measured against reference.txt in the call directory when
+one has been written by hand, otherwise against the transcript.txt saved live
+(caller "Output:" lines only), which is itself a Whisper transcript and only
+shows drift between models.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import wave
+import numpy as np
+from src.asr_backends import BACKENDS, WHISPER_SAMPLERATE, make_backend
+from src.resampler import StreamingResampler
+
+WINDOW_SAMPLES = 30 * WHISPER_SAMPLERATE
+
+def words(text):
+    text = re.sub(r"^\w+: ", "", text, flags=re.MULTILINE)
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+def caller_text(transcript):
+    """Only the caller's "Output:" lines of a saved transcript, output.wav has no mic audio"""
+    return "\n".join(line for line in transcript.splitlines() if line.startswith("Output:"))
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance between two word lists"""
+    row = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hypothesis, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1,
+                                           previous + (ref_word != hyp_word))
+    return row[-1]
+
+def load_calls(directory, limit=None):
+    calls = []
+    for path in sorted(glob.glob(os.path.join(directory, '*', 'output.wav')))[:limit]:
+        call_dir = os.path.dirname(path)
+        reference = None
+        for name in ('reference.txt', 'transcript.txt'):
+            if os.path.exists(os.path.join(call_dir, name)):
+                with open(os.path.join(call_dir, name), encoding='utf-8') as f:
+                    text = f.read()
+                reference = words(caller_text(text) if name == 'transcript.txt' else text)
+                break
+        with wave.open(path, 'rb') as wf:
+            rate = wf.getframerate()
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        audio = StreamingResampler(rate, WHISPER_SAMPLERATE).process(audio) if rate != WHISPER_SAMPLERATE \
+            else audio.astype(np.float32)
+        audio = audio / max(1.0, float(np.abs(audio).max()))
+        calls.append((call_dir, audio, reference))
+    return calls
+
+def run(calls_dir='outputs/phone_calls', backends=None, models=('tiny.en', 'base.en'),
+        batch=8, limit=None):
+    calls = load_calls(calls_dir, limit)
+    if not calls:
+        print(f"No calls found under {calls_dir}")
+        return []
+    audio_seconds = sum(len(audio) for _, audio, _ in calls) / WHISPER_SAMPLERATE
+    print(f"{len(calls)} calls, {audio_seconds / 60:.1f} minutes of audio")
+
+    results = []
+    for backend_name in backends or list(BACKENDS):
+        for model_name in models:
+            backend = make_backend(backend_name, model_name)
+            start = time.perf_counter()
+            backend.load()
+            load_seconds = time.perf_counter() - start
+            backend.warmup()
+
+            errors = reference_words = 0
+            decode_seconds = 0.0
+            for _, audio, reference in calls:
+                windows = [audio[i:i + WINDOW_SAMPLES].astype(np.float32)
+                           for i in range(0, len(audio), WINDOW_SAMPLES)]
+                texts = []
+                start = time.perf_counter()
+                for i in range(0, len(windows), batch):
+                    texts.extend(backend.transcribe_batch(windows[i:i + batch]))
+                decode_seconds += time.perf_counter() - start
+                if reference:
+                    errors += word_errors(reference, words(" ".join(texts)))
+                    reference_words += len(reference)
+            backend.release()
+
+            rtf = decode_seconds / audio_seconds
+            wer = errors / reference_words if reference_words else None
+            results.append({'backend': backend_name, 'model': model_name, 'load_s': load_seconds,
+                            'rtf': rtf, 'wer': wer})
+            wer_text = f"{wer * 100:6.1f}%" if wer is not None else "   n/a"
+            print(f"{backend_name:<14} {model_name:<10} | load {load_seconds:6.1f} s | "
+                  f"RTF {rtf:6.3f} | WER {wer_text}")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', default='outputs/phone_calls')
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS))
+    parser.add_argument('--models', nargs='+', default=['tiny.en', 'base.en'])
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--limit', type=int, help="only use the first N calls")
+    args = parser.parse_args()
+    run(args.calls, args.backends, args.models, args.batch, args.limit)
@@ -0,0 +1,60 @@
+"""Latency and throughput of the spam classifier in each runtime across sequence lengths
+
+Run from the repository root with: python -m benchmarks.bench_classifier
+Runtimes without an up to date export (python -m src.classifier_export) are skipped.
+"""
+import argparse
+import time
+import numpy as np
+import torch
+from src.model import CLASSIFIERS, RUNTIME_SUFFIXES, ClassifierManager
+
+LENGTHS = (16, 64, 128, 256, 512)
+BATCH_SIZES = (1, 32)
+
+def median_seconds(func, repeat):
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def make_batch(tokenizer, batch_size, length, rng):
+    """batch_size random sequences of exactly length tokens, [CLS] ... [SEP]"""
+    ids = rng.integers(1000, tokenizer.vocab_size, (batch_size, length))
+    ids[:, 0] = tokenizer.cls_token_id
+    ids[:, -1] = tokenizer.sep_token_id
+    input_ids = torch.from_numpy(ids).long()
+    return input_ids, torch.ones_like(input_ids)
+
+def run(name='sms', runtimes=None, repeat=20):
+    runtimes = runtimes or ['eager', *RUNTIME_SUFFIXES]
+    tokenizer = CLASSIFIERS.get_tokenizer()
+    rng = np.random.default_rng(0)
+    results = []
+    for runtime in runtimes:
+        manager = ClassifierManager(CLASSIFIERS.checkpoints, CLASSIFIERS.backbone, runtime)
+        if manager.resolve_runtime(name) != runtime:
+            print(f"Skipping {runtime}, no up to date export")
+            continue
+        model = manager.get(name)
+        for batch_size in BATCH_SIZES:
+            for length in LENGTHS:
+                input_ids, attention_mask = make_batch(tokenizer, batch_size, length, rng)
+                with torch.no_grad():
+                    seconds = median_seconds(lambda: model(input_ids, attention_mask), repeat)
+                results.append({'runtime': runtime, 'batch_size': batch_size, 'length': length,
+                                'latency_ms': seconds * 1e3, 'texts_per_second': batch_size / seconds})
+                print(f"{runtime:>16} | batch {batch_size:>3} | {length:>4} tokens | "
+                      f"{seconds * 1e3:9.2f} ms | {batch_size / seconds:9.1f} texts/s")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='sms', choices=list(CLASSIFIERS.checkpoints))
+    parser.add_argument('--runtimes', nargs='+', choices=['eager', *RUNTIME_SUFFIXES])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    run(args.model, args.runtimes, args.repeat)
@@ -0,0 +1,51 @@
+"""Compare src.codec against audioop for a 20 ms frame and a minute of audio
+
+Run from the repository root with: python -m benchmarks.bench_codec
+audioop was removed in Python 3.13, in which case only src.codec is measured.
+"""
+import timeit
+import warnings
+import numpy as np
+from src.codec import ulaw_decode, ulaw_encode
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:
+        audioop = None
+
+SIZES = {'frame (20 ms)': 160, 'minute': 8000 * 60}
+
+def best_of(func, number, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def run():
+    rng = np.random.default_rng(0)
+    results = []
+    for label, samples in SIZES.items():
+        number = 20000 if samples <= 160 else 50
+        ulaw = rng.integers(0, 256, samples, dtype=np.uint8)
+        pcm = rng.integers(-32768, 32768, samples, dtype=np.int16)
+        ulaw_bytes, pcm_bytes = ulaw.tobytes(), pcm.tobytes()
+        decoded = np.empty(samples, dtype=np.int16)
+        encoded = np.empty(samples, dtype=np.uint8)
+
+        cases = {
+            'decode codec': lambda: ulaw_decode(ulaw),
+            'decode codec (out=)': lambda: ulaw_decode(ulaw, out=decoded),
+            'encode codec': lambda: ulaw_encode(pcm),
+            'encode codec (out=)': lambda: ulaw_encode(pcm, out=encoded),
+        }
+        if audioop is not None:
+            cases['decode audioop'] = lambda: np.frombuffer(audioop.ulaw2lin(ulaw_bytes, 2), dtype=np.int16)
+            cases['encode audioop'] = lambda: audioop.lin2ulaw(pcm_bytes, 2)
+
+        for name, func in cases.items():
+            seconds = best_of(func, number)
+            results.append((label, name, seconds))
+            print(f"{label:>14} | {name:<20} | {seconds * 1e6:10.2f} us")
+    return results
+
+if __name__ == '__main__':
+    run()
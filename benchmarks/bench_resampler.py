@@ -0,0 +1,65 @@
+"""Compare the streaming polyphase resampler against per-chunk scipy.signal.resample
+
+Run from the repository root with: python -m benchmarks.bench_resampler
+Resamples a five minute 8kHz call to 16kHz the way the old transcription_worker
+did (FFT resample of each 2 second chunk) and with StreamingResampler fed
+either 20 ms frames or 2 second chunks. Boundary error is the largest
+difference from resampling the whole signal in one go with the same method.
+"""
+import time
+import numpy as np
+from scipy import signal
+from src.resampler import StreamingResampler
+
+IN_RATE = 8000
+OUT_RATE = 16000
+CALL_SECONDS = 300
+
+def chunks(audio, size):
+    return [audio[i:i + size] for i in range(0, len(audio), size)]
+
+def fft_chunked(audio, size):
+    return np.concatenate([
+        signal.resample(chunk, int(len(chunk) * OUT_RATE / IN_RATE)).astype(np.float32)
+        for chunk in chunks(audio, size)
+    ])
+
+def streaming(audio, size):
+    resampler = StreamingResampler(IN_RATE, OUT_RATE)
+    return np.concatenate([resampler.process(chunk) for chunk in chunks(audio, size)])
+
+CASES = [
+    ('scipy.signal.resample, 2 s chunks', fft_chunked, 2 * IN_RATE),
+    ('StreamingResampler, 2 s chunks', streaming, 2 * IN_RATE),
+    ('StreamingResampler, 20 ms frames', streaming, 160),
+]
+
+def call_audio(seconds=CALL_SECONDS):
+    """A 300Hz tone in noise at IN_RATE"""
+    rng = np.random.default_rng(0)
+    t = np.arange(IN_RATE * seconds) / IN_RATE
+    return (3000 * np.sin(2 * np.pi * 300 * t) + rng.normal(0, 500, len(t))).astype(np.int16)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def run():
+    audio = call_audio()
+    references = {
+        fft_chunked: signal.resample(audio.astype(np.float64), len(audio) * OUT_RATE // IN_RATE),
+        streaming: StreamingResampler(IN_RATE, OUT_RATE).process(audio),
+    }
+    results = []
+    for name, func, size in CASES:
+        reference = references[func]
+        output, seconds = timed(func, audio, size)
+        boundary_error = float(np.abs(output - reference[:len(output)]).max())
+        results.append((name, seconds, boundary_error))
+        print(f"{name:<36} | {seconds * 1000:9.1f} ms | "
+              f"{CALL_SECONDS / seconds:8.0f}x real time | boundary error {boundary_error:8.2f}")
+    return results
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,272 @@
+"""Benchmark the classification and transcription hot paths and check for regressions
+
+Run from the repository root with, for example:
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --suites codec classifier --threshold 0.2
+
+Every measurement is a time in seconds or a real-time factor, so lower is
+better. Results are written as JSON to benchmarks/results/, compared against
+benchmarks/baseline.json when it exists, and the run exits with status 1 when
+any measurement is more than threshold slower than its baseline or missing.
+Suites whose dependencies or data aren't available are skipped, which fails the
+comparison when the baseline has measurements for them.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+import numpy as np
+
+BASELINE_PATH = "benchmarks/baseline.json"
+RESULTS_DIR = "benchmarks/results"
+PHONE_CALL_DIR = "outputs/phone_calls"
+
+def median_seconds(func, repeat=5):
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def result(name, value, unit='s'):
+    return {'name': name, 'value': value, 'unit': unit}
+
+def bench_codec():
+    from benchmarks import bench_codec
+    return [result(f"codec/{label}/{name}", seconds) for label, name, seconds in bench_codec.run()]
+
+def bench_resampler(seconds=60):
+    """Median seconds to resample a call of seconds length in each chunking"""
+    from benchmarks import bench_resampler
+    audio = bench_resampler.call_audio(seconds)
+    results = []
+    for name, func, size in bench_resampler.CASES:
+        elapsed = median_seconds(lambda: func(audio, size))
+        results.append(result(f"resampler/{name}", elapsed))
+        print(f"{name:<36} | {elapsed * 1e3:9.2f} ms")
+    return results
+
+def synthetic_texts(words, count, rng):
+    vocabulary = ("please call back about your account payment verify the code today "
+                  "hello are we still meeting later thanks bank card refund prize").split()
+    return [" ".join(rng.choice(vocabulary, words)) for _ in range(count)]
+
+def bench_classifier(word_counts=(8, 64, 256), batch_sizes=(1, 8, 32)):
+    """Seconds per text for predict_label and predict_call_spam across lengths and batch sizes"""
+    from src.model import predict_labels, predict_call_spams, CLASSIFIERS
+    CLASSIFIERS.preload()
+    rng = np.random.default_rng(0)
+    results = []
+    for head, predict in (('sms', predict_labels), ('call', predict_call_spams)):
+        for words in word_counts:
+            for batch_size in batch_sizes:
+                texts = synthetic_texts(words, batch_size, rng)
+                seconds = median_seconds(lambda: predict(texts))
+                results.append(result(f"classifier/{head}/{words} words/batch {batch_size}", seconds / batch_size))
+                print(f"{head:>5} | {words:>4} words | batch {batch_size:>3} | "
+                      f"{seconds / batch_size * 1e3:9.2f} ms per text")
+    return results
+
+def synthetic_call(seconds, rate=8000):
+    """Tone bursts in noise, loud enough to get past the silence threshold"""
+    rng = np.random.default_rng(0)
+    t = np.arange(seconds * rate) / rate
+    bursts = (np.sin(2 * np.pi * 0.5 * t) > 0)
+    audio = 6000 * np.sin(2 * np.pi * (200 + 50 * np.sin(2 * np.pi * 3 * t)) * t) * bursts
+    return (audio + rng.normal(0, 300, len(t))).astype(np.int16)
+
+def recorded_call(limit_seconds=60):
+    for path in sorted(glob.glob(os.path.join(PHONE_CALL_DIR, '*', 'output.wav'))):
+        with wave.open(path, 'rb') as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                continue
+            rate = wf.getframerate()
+            audio = np.frombuffer(wf.readframes(min(wf.getnframes(), rate * limit_seconds)), dtype=np.int16)
+        return audio, rate
+    return None, None
+
+class Collector:
+    def __init__(self):
+        self.texts = []
+
+    def emit(self, text):
+        self.texts.append(text)
+
+def transcriber_rtf(audio, rate, backend, model_name):
+    """Decode seconds per second of audio through Transcriber's fixed window path"""
+    from src.transcriber import Transcriber
+    transcriber = Transcriber(Collector(), input_samplerate=rate, model_name=model_name,
+                              vad=None, backend=backend)
+    try:
+        transcriber.backend.warmup()
+        window = int(rate * transcriber.window_seconds)
+        resample = transcriber.resampler.process if transcriber.resampler else (lambda chunk: chunk)
+        start = time.perf_counter()
+        for i in range(0, len(audio), window):
+            transcriber.transcribe(resample(audio[i:i + window]))
+        return (time.perf_counter() - start) / (len(audio) / rate)
+    finally:
+        transcriber.stop()
+
+def bench_transcriber(backends=('whisper',), model_name='base.en'):
+    results = []
+    sources = [('synthetic', synthetic_call(30), 8000)]
+    recorded, rate = recorded_call()
+    if recorded is not None:
+        sources.append(('recorded', recorded, rate))
+    for backend in backends:
+        for source, audio, rate in sources:
+            rtf = transcriber_rtf(audio, rate, backend, model_name)
+            results.append(result(f"transcriber/{backend} {model_name}/{source}", rtf, 'rtf'))
+            print(f"{backend} {model_name} | {source:>9} | real-time factor {rtf:.3f}")
+    return results
+
+def write_corpus(root, documents, rng):
+    """documents message files and call transcripts, one of each mentioning the amount"""
+    messages = os.path.join(root, 'messages')
+    calls = os.path.join(root, 'phone_calls')
+    browser = os.path.join(root, 'browser')
+    for directory in (messages, calls, browser):
+        os.makedirs(directory)
+    for i in range(documents):
+        amounts = rng.integers(10, 9999, 4)
+        amount = 4321 if i == documents // 2 else amounts[0]
+        with open(os.path.join(messages, f"+1555{i:07d}.txt"), 'w') as f:
+            f.write(f"\nInput: can you send ${amount} for the order\nOutput: sure, sending ${amounts[1]} now")
+        call_dir = os.path.join(calls, f"03-01@12-00_from_+1666{i:07d}")
+        os.makedirs(call_dir)
+        with open(os.path.join(call_dir, 'transcript.txt'), 'w') as f:
+            f.write(f"Speaker 1: Hello\nSpeaker 2: The payment of ${amount} is due\nSpeaker 1: I paid {amounts[2]}")
+    return messages, calls, browser
+
+def bench_context(sizes=(10, 100, 1000)):
+    """find_context without a description, over corpora of growing size"""
+    from src import context_search
+    rng = np.random.default_rng(0)
+    results = []
+    saved = (context_search.MESSAGE_DIR, context_search.PHONE_TRANSCRIPT_DIR, context_search.BROWSER_DIR)
+    try:
+        for documents in sizes:
+            root = tempfile.mkdtemp(prefix='vigilis-bench-')
+            try:
+                (context_search.MESSAGE_DIR, context_search.PHONE_TRANSCRIPT_DIR,
+                 context_search.BROWSER_DIR) = write_corpus(root, documents, rng)
+                seconds = median_seconds(lambda: context_search.find_context('4321', '+15550000000', None))
+            finally:
+                shutil.rmtree(root)
+            results.append(result(f"context/find_context/{documents} documents", seconds))
+            print(f"find_context | {documents:>5} documents | {seconds * 1e3:9.2f} ms")
+    finally:
+        context_search.MESSAGE_DIR, context_search.PHONE_TRANSCRIPT_DIR, context_search.BROWSER_DIR = saved
+    return results
+
+SUITES = {
+    'codec': bench_codec,
+    'resampler': bench_resampler,
+    'classifier': bench_classifier,
+    'transcriber': bench_transcriber,
+    'context': bench_context,
+}
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+def compare(results, baseline, threshold, suites=SUITES):
+    """Measurements more than threshold slower than the baseline, as (name, baseline, value)
+
+    Baseline measurements of the suites that were run but missing from results,
+    for example because the suite was skipped, count as regressions with a
+    value of None.
+    """
+    previous = {item['name']: item['value'] for item in baseline['results']}
+    regressions = []
+    current = {item['name'] for item in results}
+    for name, before in previous.items():
+        if name.split('/')[0] in suites and name not in current:
+            regressions.append((name, before, None))
+            print(f"{name:<60} {before:12.6g} -> {'missing':>12}      MISSING")
+    for item in results:
+        before = previous.get(item['name'])
+        if not before:
+            continue
+        change = item['value'] / before - 1
+        flag = ''
+        if change > threshold:
+            regressions.append((item['name'], before, item['value']))
+            flag = '  REGRESSION'
+        print(f"{item['name']:<60} {before:12.6g} -> {item['value']:12.6g} {item['unit']:>3} "
+              f"({change:+.1%}){flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the classification and transcription hot paths")
+    parser.add_argument('--suites', nargs='+', default=list(SUITES), choices=list(SUITES))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="fail when a measurement is this much slower than baseline, 0.15 is 15%%")
+    parser.add_argument('--output', help="results file, defaults to benchmarks/results/<time>.json")
+    args = parser.parse_args()
+
+    results = []
+    skipped = {}
+    for name in args.suites:
+        print(f"== {name}")
+        try:
+            results.extend(SUITES[name]())
+        except (ImportError, OSError) as e:
+            skipped[name] = str(e)
+            print(f"Skipping {name}: {e}")
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'skipped': skipped,
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {output}")
+
+    if args.save_baseline:
+        shutil.copyfile(output, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['environment'].get('cpu_count') != report['environment']['cpu_count']:
+        print("Warning: the baseline was recorded on a machine with a different number of cores")
+    regressions = compare(results, baseline, args.threshold, args.suites)
+    if regressions:
+        print(f"{len(regressions)} measurements regressed by more than {args.threshold:.0%} or are missing")
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,19 @@ from flask import Flask, render_template, request, send_from_directory
 from flask_sock import Sock
 from src.frontend import TranscriptionSignals, MainWindow
 from src.audio_recorder import AudioRecorder
-from src.transcriber import Transcriber, WHISPER_SAMPLERATE
+from src.transcriber import Transcriber, WHISPER_SAMPLERATE, WHISPER_MODEL
+from src.inference_scheduler import InferenceScheduler
+from src.call_session import SessionRegistry, SessionTranscript
+from src.media_gateway import MediaConnection, MediaGateway
+from src.transcription_pool import TranscriptionPool
+from src.startup import StartupOrchestrator
+from src import model, context_search
+from src.score_cache import sms_spam_scores
+from src.classification_service import get_service, service_authkey
+from src.compute_budget import reserve_for_workers
 from twilio.rest import Client
 
 import threading
-import json
-import base64
-import numpy as np
 
 app = Flask(__name__)
 sock = Sock(app)
@@ -42,8 +48,11 @@ def accept_call():
     caller = request.form.get('From', '')
     caller_state = request.form.get('CallerState', '')
     ngrok_url = request.headers.get('Host')
+    # Media can be served by the asyncio gateway on its own public URL
+    media_url = os.getenv('MEDIA_STREAM_URL') or f"wss://{ngrok_url}/media"
     return render_template('accept.xml', 
                          url=ngrok_url,
+                         media_url=media_url,
                          caller=caller,
                          caller_state=caller_state)
 
@@ -65,6 +74,13 @@ def incoming_sms():
     with open(f"outputs/messages/{from_number}.txt", "a") as f:
         f.write(f"\nInput: {incoming_message}")
 
+    # Score on arrival so opening the conversation only reads the cache. Messages
+    # arriving together are batched by the classification service.
+    try:
+        sms_spam_scores([incoming_message])
+    except Exception as e:
+        print(f"Error scoring message: {e}")
+
     signals.incoming_msg.emit(from_number, incoming_message)
     return ""
 
@@ -72,53 +88,44 @@ def incoming_sms():
 def media_stream(ws):
     print("WebSocket connected")
 
-    first_message = True
-
-    while True:
-        message = ws.receive()
-        if message:
-            data = json.loads(message)
-            if data['event'] == 'start':
-                # Extract caller information from start event
-                caller_number = data['start']['customParameters']['caller_number']
-                caller_state = data['start']['customParameters']['caller_state']
-                window.audio_recorder.start_call(data['start']['streamSid'], ws)
-                if window:
-                    window.start_recording_from_call()
-                    signals.call_status_changed.emit("start")
-                    
-            elif data['event'] == 'media' and 'media' in data:
-                media = data['media']
-                
-                if first_message:
-                    first_message = False
-                    
-                    
-                audio_data = process_audio_payload(media['payload'])
-                if audio_data is not None:
-                    window.audio_recorder.process_audio(audio_data)
-
-            elif data['event'] == 'stop':
-                print("Received stop event")
-                signals.call_status_changed.emit("stop")
-                window.audio_recorder.stop_call()
-                break
-        else:
-            print("No message received")
-            break
-
-def process_audio_payload(payload):
-    """Process base64 encoded mulaw audio data from Twilio"""
+    connection = MediaConnection(window.audio_recorder, ws,
+                                 on_start=on_call_start, on_stop=on_call_stop,
+                                 capture_dir=os.getenv('MEDIA_CAPTURE_DIR'))
     try:
-        audio_bytes = base64.b64decode(payload)
-        audio_data = np.frombuffer(audio_bytes, dtype=np.uint8)
-        return audio_data
-    except Exception as e:
-        print(f"Error processing audio payload: {e}")
-        return None
+        while True:
+            message = ws.receive()
+            if not message:
+                print("No message received")
+                break
+            if not connection.handle(message):
+                break
+    finally:
+        connection.close()
+
+def on_call_start():
+    if window:
+        window.start_recording_from_call()
+        signals.call_status_changed.emit("start")
+
+def on_call_stop():
+    signals.call_status_changed.emit("stop")
+
+def append_session_transcript(sessions, stream_sid, text):
+    """Write a background call's transcript as it arrives, save() rewrites it in full at the end"""
+    session = sessions.get(stream_sid)
+    if session is None or not text.strip():
+        return
+    os.makedirs(session.directory, exist_ok=True)
+    with open(os.path.join(session.directory, 'transcript.txt'), 'a', encoding='utf-8') as f:
+        f.write(f"Output: {text.strip()}\n")
 
 def main():
     global qt_app, window, signals
+
+    # Models load in the background once the window is up, see src/startup.py
+    startup = StartupOrchestrator()
+    # Set before anything scores a message, the runtime is part of the cached score version
+    model.CLASSIFIERS.runtime = os.getenv('CLASSIFIER_RUNTIME') or 'eager'
     
     # Start Flask in a separate thread
     flask_thread = threading.Thread(target=start_flask, daemon=True)
@@ -128,17 +135,92 @@ def main():
     qt_app = QApplication(sys.argv)
     signals = TranscriptionSignals()
     
+    # Optionally run Whisper in worker processes so decoding stays off the GUI process
+    processes = int(os.getenv('TRANSCRIPTION_PROCESSES') or 0)
+    # Worker processes own ASR's cores, this process keeps the rest for scoring and search.
+    # Done before any background loading starts using the budget.
+    worker_cores = reserve_for_workers(processes) if processes else None
+    backend = os.getenv('ASR_BACKEND') or 'whisper'
+    model_name = os.getenv('ASR_MODEL') or WHISPER_MODEL
+    # Filled in by load_transcription
+    asr = {'pool': None, 'scheduler': None}
+
+    def make_transcriber(transcription_ready, **options):
+        if asr['pool']:
+            return asr['pool'].open_stream(transcription_ready, **options)
+        return Transcriber(transcription_ready, model_name=model_name, backend=backend,
+                           scheduler=asr['scheduler'], **options)
+
+    def session_transcriber(stream_sid):
+        # Until the transcription task has loaded, the session asks again as audio arrives,
+        # rather than loading Whisper on the media thread
+        if asr['pool'] is None and asr['scheduler'] is None:
+            return None
+        return make_transcriber(SessionTranscript(stream_sid, signals.session_transcription_ready))
+
+    # Calls that arrive while another is active get their own transcriber
+    sessions = SessionRegistry(session_transcriber)
+    signals.session_transcription_ready.connect(
+        lambda stream_sid, text: append_session_transcript(sessions, stream_sid, text))
+
     # Create audio recorder first to detect devices
-    recorder = AudioRecorder(None, None)
+    recorder = AudioRecorder(None, None, sessions)
     
-    mic_transcriber = Transcriber(signals.mic_transcription_ready)
-    mix_transcriber = Transcriber(signals.mix_transcription_ready)
+    window = MainWindow(recorder, signals, startup)
+
+    # Optionally serve /media from the asyncio gateway alongside the Flask routes
+    gateway_port = os.getenv('MEDIA_GATEWAY_PORT')
+    if gateway_port:
+        gateway = MediaGateway(recorder, port=int(gateway_port),
+                               on_start=on_call_start, on_stop=on_call_stop,
+                               capture_dir=os.getenv('MEDIA_CAPTURE_DIR'))
+        gateway.start()
 
-    recorder.input_transcriber = mic_transcriber
-    recorder.mix_transcriber = mix_transcriber
-    
-    window = MainWindow(recorder, signals)
     window.show()
+    startup.mark("window shown")
+
+    def load_transcription():
+        if processes:
+            asr['pool'] = TranscriptionPool(processes, model_name, backend=backend,
+                                            worker_cores=worker_cores)
+        else:
+            # Every stream's windows are decoded in shared batches
+            asr['scheduler'] = InferenceScheduler(model_name, backend=backend)
+
+        # Streaming shows partial words as they are recognised for the call in the window
+        if os.getenv('STREAMING_TRANSCRIPTION'):
+            recorder.input_transcriber = make_transcriber(signals.mic_transcription_ready, streaming=True,
+                                                          partial_ready=signals.mic_partial_ready)
+            recorder.mix_transcriber = make_transcriber(signals.mix_transcription_ready, streaming=True,
+                                                        partial_ready=signals.mix_partial_ready)
+        else:
+            recorder.input_transcriber = make_transcriber(signals.mic_transcription_ready)
+            recorder.mix_transcriber = make_transcriber(signals.mix_transcription_ready)
+
+    def warm_transcription():
+        # Worker processes load their own models
+        if asr['scheduler'] is not None:
+            asr['scheduler'].backend.warmup()
+        elif asr['pool'] is None:
+            recorder.mix_transcriber.backend.warmup()
+
+    startup.add('transcription', load_transcription, warm_transcription)
+    # Each classifier loads on its own thread, sharing the tokenizer
+    startup.add('sms_classifier', lambda: model.CLASSIFIERS.get('sms'), lambda: model.predict_label("Hello"))
+    startup.add('call_classifier', lambda: model.CLASSIFIERS.get('call'),
+                lambda: model.predict_call_spam("Speaker 1: Hello"))
+    startup.add('context_search', context_search.load_embedder, context_search.warmup)
+    service_port = os.getenv('CLASSIFIER_SERVICE_PORT')
+    if service_port:
+        authkey = service_authkey()
+        if not os.getenv('CLASSIFIER_SERVICE_AUTHKEY'):
+            print("CLASSIFIER_SERVICE_AUTHKEY isn't set, using a random key, so no other process can connect")
+        get_service().serve(int(service_port), authkey)
+    startup_log = os.getenv('STARTUP_LOG')
+    if startup_log:
+        startup.all_done.connect(lambda: startup.write_timeline(startup_log))
+    startup.start()
+
     sys.exit(qt_app.exec())
 
 if __name__ == '__main__':
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+import torch
+import whisper
+from src.model_registry import ModelRegistry
+from src.compute_budget import COMPUTE
+
+WHISPER_MODEL = "base.en"
+WHISPER_SAMPLERATE = 16000
+
+# Next model down in size, used to fall back when transcription can't keep up
+SMALLER_MODELS = {
+    'large': 'medium', 'medium': 'small', 'small': 'base', 'base': 'tiny',
+    'medium.en': 'small.en', 'small.en': 'base.en', 'base.en': 'tiny.en',
+}
+
+# Whisper weights are loaded once per process and shared by every backend instance
+WHISPER_MODELS = ModelRegistry(whisper.load_model)
+
+class WhisperBackend:
+    """openai-whisper on the CPU in float32
+
+    load() acquires the shared model, transcribe() decodes one window with an
+    optional prompt and transcribe_batch() decodes several 16kHz float32 windows
+    in a single batched decode. Every call holds the model's inference lock.
+    """
+    name = 'whisper'
+
+    def __init__(self, model_name=WHISPER_MODEL):
+        self.model_name = model_name
+        self.model = None
+        self.options = whisper.DecodingOptions(language='en', fp16=False, without_timestamps=True)
+
+    @property
+    def key(self):
+        return self.model_name
+
+    def load_model(self, model_name):
+        return whisper.load_model(model_name, device='cpu')
+
+    def load(self):
+        if self.model is None:
+            self.model = WHISPER_MODELS.acquire(self.key, lambda key: self.load_model(self.model_name))
+            # Whisper installs kv-cache hooks on the shared model for every decode
+            self.lock = WHISPER_MODELS.inference_lock(self.key)
+        return self
+
+    def warmup(self):
+        """Run one short decode so the first real window doesn't pay for it"""
+        start = time.time()
+        self.transcribe_batch([np.zeros(WHISPER_SAMPLERATE, dtype=np.float32)])
+        print(f"Warmed up {self.name} {self.model_name} in {time.time() - start:.2f} seconds")
+
+    def transcribe(self, audio, prompt=None):
+        with self.lock, COMPUTE.run('call_asr'):
+            result = self.model.transcribe(
+                audio,
+                language='en',
+                fp16=False,
+                condition_on_previous_text=False,
+                without_timestamps=True,
+                initial_prompt=prompt,
+            )
+        return result["text"]
+
+    def transcribe_segments(self, audio):
+        """Transcribe a whole recording into (start seconds, end seconds, text) segments"""
+        with self.lock, COMPUTE.run('call_asr'):
+            result = self.model.transcribe(audio, language='en', fp16=False)
+        return [(segment['start'], segment['end'], segment['text'].strip())
+                for segment in result['segments']]
+
+    def transcribe_batch(self, windows):
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)),
+                                        n_mels=self.model.dims.n_mels)
+            for audio in windows
+        ]).to(self.model.device)
+        with self.lock, COMPUTE.run('call_asr'):
+            results = whisper.decode(self.model, mel, self.options)
+        return [result.text for result in results]
+
+    def release(self):
+        if self.model is not None:
+            self.model = None
+            WHISPER_MODELS.release(self.key)
+
+class QuantizedWhisperBackend(WhisperBackend):
+    """Whisper with its linear layers dynamically quantized to int8
+
+    Weights are stored as int8 and activations are quantized on the fly, which
+    roughly quarters the size of the linear layers and speeds them up on CPUs
+    with fast integer dot products. Embeddings, convolutions and layer norms
+    stay in float32.
+    """
+    name = 'whisper-int8'
+
+    @property
+    def key(self):
+        return f"{self.model_name}:int8"
+
+    def load_model(self, model_name):
+        model = whisper.load_model(model_name, device='cpu')
+        # whisper.model.Linear only adds a dtype cast to forward, which is a no-op
+        # in float32. quantize_dynamic matches exact types, so make them plain Linears.
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+BACKENDS = {'whisper': WhisperBackend, 'whisper-int8': QuantizedWhisperBackend}
+
+def make_backend(backend, model_name=WHISPER_MODEL):
+    """Build a backend from a name in BACKENDS, or return an existing instance unchanged"""
+    if isinstance(backend, str):
+        return BACKENDS[backend](model_name)
+    return backend
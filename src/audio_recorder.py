@@ -3,23 +3,32 @@ sd.default.latency = 'low'
 import numpy as np
 import wave
 import os
+import threading
 from datetime import datetime
-import queue
-import base64
-import audioop
-import json
 from src.transcriber import WHISPER_SAMPLERATE, TWILIO_SAMPLERATE, Transcriber
+from src.call_session import SessionRegistry
+from src.media_sender import MediaSender
+from src.ring_buffer import RecordingBuffer
 
 class AudioRecorder:
-    def __init__(self, input_transcriber: Transcriber, mix_transcriber: Transcriber):
+    def __init__(self, input_transcriber: Transcriber, mix_transcriber: Transcriber,
+                 sessions: SessionRegistry = None, frames_per_message: int = 1):
         self.input_transcriber = input_transcriber
         self.mix_transcriber = mix_transcriber
         self.is_recording = False
         self.samplerate = WHISPER_SAMPLERATE
-        self.mic_frames = []
-        self.mix_frames = []
-        self.ws = None
-        self.stream_sid = None
+        self.mic_frames = RecordingBuffer()
+        self.mix_frames = RecordingBuffer()
+        # Every connected media stream lives in the registry; the active session is
+        # the one routed to the local microphone and speaker
+        self.sessions = sessions if sessions is not None else SessionRegistry()
+        self.active_session = None
+        # Calls start and stop on Flask and gateway threads
+        self.call_lock = threading.Lock()
+        self.last_directory = None
+        # Encoding and sending microphone audio happens off the PortAudio thread
+        self.media_sender = MediaSender(lambda: self.active_session,
+                                        frames_per_message=frames_per_message)
         
         # Initialize audio devices
         self.init_audio_devices()
@@ -57,54 +66,49 @@ class AudioRecorder:
             self.current_mic = None
             self.current_mix = None
     
+    @property
+    def ws(self):
+        session = self.active_session
+        return session.ws if session else None
+
+    @property
+    def stream_sid(self):
+        session = self.active_session
+        return session.stream_sid if session else None
+
     def start_recording(self):
         if self.current_mic is None:
             raise RuntimeError("No microphone selected")
             
         self.is_recording = True
-        self.mic_frames = []
-        self.mix_frames = []
+        self.mic_frames = RecordingBuffer()
+        self.mix_frames = RecordingBuffer()
         
         def mic_callback(indata, frames, time, status):
             # if status:
             #     print(f"Mic Status: {status}")
-            self.mic_frames.append(indata.copy())
-            self.input_transcriber.queue_audio(indata)
-
-            pcm_data = indata.tobytes()
-            mulaw_data = audioop.lin2ulaw(pcm_data, 2)  # Convert 16-bit PCM to 8-bit mu-law
-            
-            # Encode as base64
-            b64_data = base64.b64encode(mulaw_data).decode('utf-8')
-            
-            # Create media message
-            message = {
-                "event": "media",
-                "streamSid": self.stream_sid,
-                "media": {
-                    "payload": b64_data
-                }
-            }
-            
-            # Send through websocket
-            self.ws.send(json.dumps(message))
+            self.mic_frames.write(indata)
+            # Transcribers are attached once speech recognition has loaded
+            if self.input_transcriber is not None:
+                self.input_transcriber.queue_audio(indata)
+            self.media_sender.write(indata)
 
         def mix_callback(indata, frames, time, status):
             if status:
                 print(f"Mix Status: {status}")
-            self.mix_frames.append(indata.copy())
-            self.mix_transcriber.queue_audio(indata)
+            self.mix_frames.write(indata)
+            if self.mix_transcriber is not None:
+                self.mix_transcriber.queue_audio(indata)
 
         def _audio_callback_output(outdata, frames, time, status):
             """Callback for audio output"""
             # if status:
             #     print(f"Output status: {status}")
-            try:
-                data = self.audio_queue.get_nowait()
-                self.mix_frames.append(data.copy())
-                self.mix_transcriber.queue_audio(data)
+            session = self.active_session
+            data = session.next_playback_frame() if session else None
+            if data is not None:
                 outdata[:] = data[:len(outdata)]
-            except queue.Empty:
+            else:
                 outdata[:] = np.zeros((len(outdata), 1), dtype=np.int16)
                    
         # Start microphone input stream
@@ -126,7 +130,6 @@ class AudioRecorder:
         )
         
         # Audio playback setup
-        self.audio_queue = queue.Queue()
         self.mix_stream = sd.OutputStream(
             samplerate=TWILIO_SAMPLERATE,
             channels=1,
@@ -148,24 +151,58 @@ class AudioRecorder:
         #         latency='low'
         #     )
         
+        self.media_sender.start()
         self.mic_stream.start()
         if self.current_mix:
             self.mix_stream.start()
     
-    def start_call(self, stream_sid, ws):
+    def start_call(self, stream_sid, ws, caller_number=None):
+        """Register a media stream and return its session
+
+        The first call to connect is attached to the local audio devices and the
+        main window transcript. Calls that connect while it is active are only
+        recorded and transcribed in the background.
+        """
         print(f"Starting call with stream SID: {stream_sid}")
-        self.stream_sid = stream_sid
-        self.ws = ws
+        with self.call_lock:
+            if self.active_session is None or self.active_session.stream_sid == stream_sid:
+                # Looked up per chunk, mix_transcriber is None until transcription has loaded
+                session = self.sessions.create(stream_sid, ws, playback=True, caller_number=caller_number,
+                                               transcriber_source=lambda: self.mix_transcriber)
+                self.active_session = session
+            else:
+                session = self.sessions.create(stream_sid, ws, caller_number=caller_number)
+        return session
+
+    def is_active(self, stream_sid):
+        session = self.active_session
+        return session is not None and session.stream_sid == stream_sid
 
-    def stop_call(self):
-        self.stream_sid = None
-        self.ws = None
+    def stop_call(self, stream_sid=None):
+        """Tear down a session, defaulting to the active one"""
+        with self.call_lock:
+            if stream_sid is None:
+                if self.active_session is None:
+                    return
+                stream_sid = self.active_session.stream_sid
 
-    def process_audio(self, audio_data):
-        pcm_data = audioop.ulaw2lin(audio_data.tobytes(), 2)
-        pcm_array = np.frombuffer(pcm_data, dtype=np.int16)
-        pcm_array = pcm_array.reshape(-1, 1)
-        self.audio_queue.put(pcm_array)
+            session = self.sessions.remove(stream_sid)
+            if session is None:
+                return
+            if session is self.active_session:
+                # The window saves the active call through stop_recording
+                self.active_session = None
+                self.mix_frames.extend(session.take_recording())
+                return
+        # Background calls are written to disk outside the lock
+        directory = session.save()
+        if directory:
+            print(f"Background call {stream_sid} saved to {directory}")
+
+    def process_audio(self, audio_data, stream_sid=None, chunk=None, timestamp=None):
+        session = self.sessions.get(stream_sid) if stream_sid else self.active_session
+        if session is not None:
+            session.process_audio(audio_data, chunk, timestamp)
 
     def stop_recording(self, transcript_text=None, call_number=None):
         if not self.is_recording:
@@ -175,6 +212,8 @@ class AudioRecorder:
         
         self.mic_stream.stop()
         self.mic_stream.close()
+        self.media_sender.stop()
+        print(f"Media sender stats: {self.media_sender.stats()}")
 
         if hasattr(self, 'mix_stream'):
             self.mix_stream.stop()
@@ -184,10 +223,11 @@ class AudioRecorder:
         timestamp = datetime.now().strftime("%m-%d@%H-%M")
         directory = f"outputs/phone_calls/{timestamp}" + f"_from_{call_number}" if call_number else ""
         os.makedirs(directory, exist_ok=True)
+        self.last_directory = directory
 
         # Save audio files
         self.save_audio(self.mic_frames, f"{directory}/mic_recording.wav")
-        if self.mix_frames:
+        if len(self.mix_frames):
             self.save_audio(self.mix_frames, f"{directory}/output.wav", 
                           samplerate=TWILIO_SAMPLERATE)
         
@@ -198,28 +238,26 @@ class AudioRecorder:
         return f"Recording saved to {directory}"
     
     def save_audio(self, frames, filename, samplerate=TWILIO_SAMPLERATE):
-        if not frames:
+        if not len(frames):
             return
             
         try:
-            audio_data = np.concatenate(frames, axis=0)
-            
             with wave.open(filename, 'wb') as wf:
                 wf.setnchannels(1)  # Mono
                 wf.setsampwidth(2)  # 16-bit audio
                 wf.setframerate(samplerate)
-                wf.writeframes((audio_data).astype(np.int16))
+                frames.write_wave(wf)
         except Exception as e:
             print(f"Error saving {filename}: {str(e)}")
     
     def save_combined_audio(self, mic_frames, mix_frames, filename):
-        if not mic_frames or not mix_frames:
+        if not len(mic_frames) or not len(mix_frames):
             return
             
         try:
             # Convert both to numpy arrays
-            mic_data = np.concatenate(mic_frames, axis=0)
-            mix_data = np.concatenate(mix_frames, axis=0)
+            mic_data = mic_frames.array().astype(np.float32)
+            mix_data = mix_frames.array().astype(np.float32)
             
             # Make sure both arrays are the same length
             min_length = min(len(mic_data), len(mix_data))
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from PyQt6.QtCore import QObject, pyqtSignal
+
+class CallRiskWorker(QObject):
+    """Scores the live call transcript for scams on a background thread
+
+    add_utterance() records transcript deltas from the GUI thread. Once no new
+    delta has arrived for debounce seconds (or max_delay seconds after the first
+    unscored one), the last window_chars of the transcript are scored and
+    risk_updated is emitted with the score and the seconds from the oldest
+    unscored utterance to its score. Every score is kept in a per-call timeline.
+    """
+    risk_updated = pyqtSignal(float, float)
+
+    def __init__(self, score=None, debounce=0.75, max_delay=3.0, window_chars=700):
+        super().__init__()
+        self.score = score
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.window_chars = window_chars
+
+        self.lines = []
+        self.last_prefix = None
+        self.first_pending = None
+        self.last_delta = None
+        self.call_started = time.time()
+        self.timeline = []
+        self.condition = threading.Condition()
+        self.should_stop = False
+        threading.Thread(target=self.worker, daemon=True).start()
+
+    def add_utterance(self, prefix, text):
+        with self.condition:
+            if prefix == self.last_prefix and self.lines:
+                self.lines[-1] += f" {text}"
+            else:
+                self.lines.append(f"{prefix}: {text}")
+            self.last_prefix = prefix
+            now = time.time()
+            self.last_delta = now
+            if self.first_pending is None:
+                self.first_pending = now
+            self.condition.notify()
+
+    def reset(self):
+        """Start a new call"""
+        with self.condition:
+            self.lines = []
+            self.last_prefix = None
+            self.first_pending = None
+            self.last_delta = None
+            self.call_started = time.time()
+            self.timeline = []
+
+    def next_window(self):
+        """Wait until the transcript has settled, returns (text, first pending time)"""
+        with self.condition:
+            while not self.should_stop:
+                if self.first_pending is None:
+                    self.condition.wait()
+                    continue
+                now = time.time()
+                due = min(self.last_delta + self.debounce, self.first_pending + self.max_delay)
+                if now < due:
+                    self.condition.wait(due - now)
+                    continue
+                pending, self.first_pending = self.first_pending, None
+                return "\n".join(self.lines)[-self.window_chars:], pending
+        return None, None
+
+    def worker(self):
+        score, ready = self.score, lambda: True
+        if score is None:
+            from src.model import predict_call_spam, models_ready
+            score, ready = predict_call_spam, lambda: models_ready('call')
+        while not self.should_stop:
+            text, pending = self.next_window()
+            if text is None:
+                break
+            if not ready():
+                # Try again once the classifier has loaded
+                with self.condition:
+                    if self.first_pending is None:
+                        self.first_pending = pending
+                time.sleep(0.5)
+                continue
+            try:
+                probability = score(text)
+            except Exception as e:
+                print(f"Error scoring call: {e}")
+                continue
+            scored = time.time()
+            latency = scored - pending
+            with self.condition:
+                self.timeline.append({'seconds': round(scored - self.call_started, 2),
+                                      'score': probability, 'latency_s': round(latency, 3)})
+            self.risk_updated.emit(probability, latency)
+
+    def stats(self):
+        with self.condition:
+            latencies = [point['latency_s'] for point in self.timeline]
+        return {
+            'scores': len(latencies),
+            'max_score': max((point['score'] for point in self.timeline), default=None),
+            'mean_latency_s': sum(latencies) / len(latencies) if latencies else None,
+            'max_latency_s': max(latencies, default=None),
+        }
+
+    def save_timeline(self, path):
+        with self.condition:
+            timeline = list(self.timeline)
+        with open(path, 'w') as f:
+            json.dump(timeline, f, indent=2)
+
+    def stop(self):
+        with self.condition:
+            self.should_stop = True
+            self.condition.notify()
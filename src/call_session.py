@@ -0,0 +1,181 @@
+import threading
+import os
+import wave
+from datetime import datetime
+from src.transcriber import TWILIO_SAMPLERATE
+from src.codec import ulaw_decode
+from src.jitter_buffer import JitterBuffer
+from src.ring_buffer import RecordingBuffer
+
+class SessionTranscript:
+    """Collects transcription output for a call that is not shown in the main window"""
+    def __init__(self, stream_sid, signal=None):
+        self.stream_sid = stream_sid
+        self.signal = signal
+        self.lines = []
+
+    def emit(self, text):
+        self.lines.append(text.strip())
+        if self.signal is not None:
+            self.signal.emit(self.stream_sid, text)
+
+    def text(self):
+        return "\n".join(f"Output: {line}" for line in self.lines if line)
+
+class CallSession:
+    """State belonging to a single Twilio media stream
+
+    transcriber_source, when given, is called for the transcriber as audio
+    arrives for as long as the session has none, so a call that connects while
+    the models are still loading is transcribed once they are ready. A source
+    result is kept when the session owns it, otherwise it is looked up again
+    for every chunk.
+    """
+    def __init__(self, stream_sid, ws, transcriber=None, owns_transcriber=False,
+                 playback=False, caller_number=None, transcriber_source=None):
+        self.stream_sid = stream_sid
+        self.ws = ws
+        self.transcriber = transcriber
+        self.owns_transcriber = owns_transcriber
+        self.transcriber_source = transcriber_source
+        self.lock = threading.Lock()
+        self.caller_number = caller_number
+        self.started_at = datetime.now()
+        timestamp = self.started_at.strftime("%m-%d@%H-%M")
+        self.directory = f"outputs/phone_calls/{timestamp}_from_{caller_number or stream_sid}"
+        self.recording = RecordingBuffer()
+        self.playback_buffer = JitterBuffer() if playback else None
+        self.closed = False
+
+    def decode(self, audio_data):
+        # Decode straight into the recording, the jitter buffer and transcriber get views of it
+        return ulaw_decode(audio_data, out=self.recording.reserve(len(audio_data))).reshape(-1, 1)
+
+    def current_transcriber(self):
+        if self.transcriber is not None or self.transcriber_source is None:
+            return self.transcriber
+        transcriber = self.transcriber_source()
+        if transcriber is not None and self.owns_transcriber:
+            with self.lock:
+                if self.closed:
+                    # Closed while it was being made, nobody else will stop it
+                    transcriber.stop()
+                    return None
+                self.transcriber = transcriber
+        return transcriber
+
+    def process_audio(self, audio_data, chunk=None, timestamp=None):
+        if self.closed:
+            return
+        pcm_array = self.decode(audio_data)
+        if self.playback_buffer is not None:
+            self.playback_buffer.put(pcm_array, chunk, timestamp)
+        transcriber = self.current_transcriber()
+        if transcriber is not None:
+            transcriber.queue_audio(pcm_array)
+
+    def next_playback_frame(self):
+        if self.playback_buffer is None:
+            return None
+        return self.playback_buffer.get()
+
+    def playback_stats(self):
+        return self.playback_buffer.stats() if self.playback_buffer is not None else None
+
+    def take_recording(self):
+        recording, self.recording = self.recording, RecordingBuffer()
+        return recording
+
+    def save(self, directory=None):
+        """Save the inbound audio and any collected transcript for this call"""
+        directory = directory or self.directory
+        recording = self.take_recording()
+        if not len(recording):
+            return None
+        os.makedirs(directory, exist_ok=True)
+        with wave.open(f"{directory}/output.wav", 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(TWILIO_SAMPLERATE)
+            recording.write_wave(wf)
+
+        transcript = getattr(self.transcriber, 'transcription_ready', None)
+        if isinstance(transcript, SessionTranscript) and transcript.lines:
+            with open(f"{directory}/transcript.txt", 'w', encoding='utf-8') as f:
+                f.write(transcript.text())
+        return directory
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        if self.playback_buffer is not None:
+            stats = self.playback_buffer.stats()
+            print(f"Playback stats for {self.stream_sid}: {stats}")
+            self.playback_buffer.clear()
+        if self.owns_transcriber and self.transcriber is not None:
+            if hasattr(self.transcriber, 'stats'):
+                print(f"Transcription stats for {self.stream_sid}: {self.transcriber.stats()}")
+            self.transcriber.stop()
+
+class SessionRegistry:
+    """Thread-safe map of active media streams keyed by streamSid
+
+    transcriber_factory is called with the stream SID for calls that need their
+    own Transcriber and should return one, or None while transcription isn't
+    ready yet, in which case it is asked again as audio arrives. If it is None
+    such calls are recorded but not transcribed.
+    """
+    def __init__(self, transcriber_factory=None):
+        self.transcriber_factory = transcriber_factory
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, stream_sid, ws, transcriber=None, playback=False, caller_number=None,
+               transcriber_source=None):
+        """Start a session, with transcriber, transcriber_source() or the factory's transcriber"""
+        owns_transcriber = False
+        if transcriber is None and transcriber_source is None and self.transcriber_factory is not None:
+            factory = self.transcriber_factory
+            transcriber_source = lambda: factory(stream_sid)
+            owns_transcriber = True
+
+        session = CallSession(stream_sid, ws, transcriber=transcriber,
+                              owns_transcriber=owns_transcriber,
+                              playback=playback, caller_number=caller_number,
+                              transcriber_source=transcriber_source)
+        with self._lock:
+            previous = self._sessions.get(stream_sid)
+            self._sessions[stream_sid] = session
+        if previous is not None:
+            previous.close()
+        return session
+
+    def get(self, stream_sid):
+        with self._lock:
+            return self._sessions.get(stream_sid)
+
+    def remove(self, stream_sid):
+        with self._lock:
+            session = self._sessions.pop(stream_sid, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, stream_sid):
+        with self._lock:
+            return stream_sid in self._sessions
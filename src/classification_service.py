@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from multiprocessing.managers import BaseManager
+
+class ScoreRequest:
+    def __init__(self, head, text):
+        self.head = head
+        self.text = text
+        self.future = Future()
+        self.submitted = time.time()
+
+def depth_bucket(depth):
+    """Power of two bucket for a queue depth: '0', '1', '2-3', '4-7', ..."""
+    if depth < 2:
+        return str(depth)
+    low = 1 << (depth.bit_length() - 1)
+    return f"{low}-{2 * low - 1}"
+
+class ClassificationService:
+    """Scores texts with the spam classifiers as micro-batches on one thread
+
+    submit() can be called from any thread and returns a Future with the spam
+    probability. The worker takes the first waiting request, keeps collecting
+    until max_batch are queued or max_wait seconds have passed, then runs one
+    batched forward pass per classifier head. Other processes can score through
+    serve() and connect().
+    """
+    def __init__(self, max_batch=32, max_wait=0.01, predict=None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.predict = predict
+        self.requests = queue.Queue()
+        self.should_stop = False
+
+        self.lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.queue_depths = Counter()
+        self.texts = 0
+        self.total_wait = 0.0
+        self.total_inference = 0.0
+
+        self.worker_thread = threading.Thread(target=self.worker, daemon=True)
+        self.worker_thread.start()
+
+    def submit(self, head, text):
+        request = ScoreRequest(head, text)
+        self.requests.put(request)
+        return request.future
+
+    def scores(self, head, texts, timeout=None):
+        """Spam probabilities for texts, blocking until they are all scored"""
+        futures = [self.submit(head, text) for text in texts]
+        return [future.result(timeout) for future in futures]
+
+    def collect(self):
+        try:
+            batch = [self.requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        with self.lock:
+            self.queue_depths[depth_bucket(self.requests.qsize() + 1)] += 1
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            try:
+                # Take whatever is already queued even once the window has passed
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0
+                             else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def worker(self):
+        predict = self.predict
+        if predict is None:
+            from src.model import predict_labels, predict_call_spams
+            heads = {'sms': predict_labels, 'call': predict_call_spams}
+            predict = lambda head, texts: heads[head](texts)
+        while not self.should_stop:
+            batch = self.collect()
+            if not batch:
+                continue
+            now = time.time()
+            by_head = {}
+            for request in batch:
+                by_head.setdefault(request.head, []).append(request)
+            start = time.time()
+            for head, requests in by_head.items():
+                try:
+                    probabilities = predict(head, [request.text for request in requests])
+                except Exception as e:
+                    print(f"Error scoring batch of {len(requests)} {head} texts: {e}")
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+                for request, probability in zip(requests, probabilities):
+                    request.future.set_result(probability)
+            with self.lock:
+                self.batch_sizes[len(batch)] += 1
+                self.texts += len(batch)
+                self.total_wait += sum(now - request.submitted for request in batch)
+                self.total_inference += time.time() - start
+
+    def stats(self):
+        with self.lock:
+            batches = sum(self.batch_sizes.values())
+            return {
+                'batches': batches,
+                'texts': self.texts,
+                'mean_batch': self.texts / batches if batches else 0.0,
+                'mean_wait_s': self.total_wait / self.texts if self.texts else 0.0,
+                'mean_inference_s': self.total_inference / batches if batches else 0.0,
+                'queued': self.requests.qsize(),
+                'batch_sizes': dict(sorted(self.batch_sizes.items())),
+                'queue_depths': dict(sorted(self.queue_depths.items(), key=lambda item: int(item[0].split('-')[0]))),
+            }
+
+    def serve(self, port, authkey, host='127.0.0.1'):
+        """Accept score requests on host:port from processes that know authkey
+
+        The manager protocol unpickles what clients send, so authkey must be a
+        secret, see service_authkey().
+        """
+        class ServiceManager(BaseManager):
+            pass
+        ServiceManager.register('classifier', callable=lambda: self, exposed=('scores', 'stats'))
+        server = ServiceManager(address=(host, port), authkey=authkey).get_server()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Classification service listening on {host}:{port}")
+        return server
+
+    def stop(self):
+        self.should_stop = True
+
+class ClientManager(BaseManager):
+    pass
+
+ClientManager.register('classifier')
+
+def service_authkey():
+    """CLASSIFIER_SERVICE_AUTHKEY, or a random key for this run only"""
+    key = os.getenv('CLASSIFIER_SERVICE_AUTHKEY')
+    return key.encode() if key else os.urandom(32)
+
+def connect(port, authkey, host='127.0.0.1'):
+    """A proxy to a service in another process, with scores(head, texts) and stats()"""
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    manager = ClientManager(address=(host, port), authkey=authkey)
+    manager.connect()
+    return manager.classifier()
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ClassificationService()
+    return _service
@@ -0,0 +1,130 @@
+"""Export the SMS and call spam classifiers to TorchScript and ONNX
+
+Run from the repository root with, for example:
+    python -m src.classifier_export --runtimes torchscript torchscript-int8
+    python -m src.classifier_export --check
+
+Every export is written next to its checkpoint (models/bert_model_2.ts.pt, ...)
+and compared against the eager model on texts of several lengths. The int8
+variants dynamically quantize the linear layers. ONNX export needs the onnx
+package, and running or quantizing ONNX exports needs onnxruntime.
+Select a runtime with CLASSIFIER_RUNTIME in .env.
+"""
+import argparse
+import os
+import sys
+import time
+import torch
+from src.model import (CLASSIFIERS, RUNTIME_SUFFIXES, ClassifierManager, artifact_path,
+                       predict_batch)
+
+SAMPLE_TEXTS = [
+    "Hii! How are you doing today?",
+    "Are we still on for dinner at 7?",
+    "URGENT: your account has been suspended. Verify your details at the link below to restore access.",
+    "Congratulations! You've won a $1000 gift card. Reply YES to claim your prize now.",
+    "Speaker 1: Hello?\nSpeaker 2: Hi, is this a good time to talk about your car's extended warranty?",
+    "Speaker 2: Hi, I am calling from the IRS today to let you know that your tax forms are incorrect.\n"
+    "Speaker 1: Oh what? What should I be doing?\nSpeaker 2: There are a few legal procedures",
+]
+# Repeat the samples so parity is also checked near the 512 token limit
+LENGTH_REPEATS = (1, 4, 16, 48)
+
+# Largest acceptable difference in spam probability from the eager model
+TOLERANCE = {'torchscript': 1e-4, 'onnx': 1e-4, 'torchscript-int8': 0.05, 'onnx-int8': 0.05}
+
+def example_inputs(tokenizer):
+    """A padded batch, so the traced graph keeps the attention mask path"""
+    encoding = tokenizer(SAMPLE_TEXTS[:2], padding=True, return_tensors='pt')
+    return encoding['input_ids'], encoding['attention_mask']
+
+def quantize(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def export_torchscript(model, inputs, path):
+    with torch.no_grad():
+        traced = torch.jit.trace(model, inputs, strict=False, check_trace=False)
+        traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, path)
+
+def export_onnx(model, inputs, path):
+    torch.onnx.export(
+        model, inputs, path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                      'attention_mask': {0: 'batch', 1: 'sequence'},
+                      'logits': {0: 'batch'}},
+        opset_version=17,
+    )
+
+def export(name, runtimes, manager=CLASSIFIERS):
+    """Write each requested export of the named classifier, returns their paths"""
+    checkpoint = manager.checkpoints[name]
+    model = manager.load_eager(name)
+    inputs = example_inputs(manager.get_tokenizer())
+    paths = {}
+    for runtime in runtimes:
+        path = artifact_path(checkpoint, runtime)
+        start = time.time()
+        if runtime == 'torchscript':
+            export_torchscript(model, inputs, path)
+        elif runtime == 'torchscript-int8':
+            export_torchscript(quantize(model), inputs, path)
+        elif runtime == 'onnx':
+            export_onnx(model, inputs, path)
+        elif runtime == 'onnx-int8':
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            float_path = artifact_path(checkpoint, 'onnx')
+            if not os.path.exists(float_path):
+                export_onnx(model, inputs, float_path)
+            quantize_dynamic(float_path, path, weight_type=QuantType.QInt8)
+        paths[runtime] = path
+        print(f"Exported {name} {runtime} to {path} ({os.path.getsize(path) / 1e6:.1f} MB) "
+              f"in {time.time() - start:.1f} seconds")
+    return paths
+
+def parity_texts():
+    return [" ".join([text] * repeats) for repeats in LENGTH_REPEATS for text in SAMPLE_TEXTS]
+
+def check_parity(name, runtime, manager=CLASSIFIERS):
+    """Compare an export against the eager model, returns (max difference, label agreement)"""
+    tokenizer = manager.get_tokenizer()
+    texts = parity_texts()
+    eager = predict_batch(texts, manager.load_eager(name), tokenizer, batch_size=8)
+    exported = ClassifierManager(manager.checkpoints, manager.backbone, runtime)
+    if exported.resolve_runtime(name) != runtime:
+        return None
+    scores = predict_batch(texts, exported.get(name), tokenizer, batch_size=8)
+    difference = max(abs(a - b) for a, b in zip(eager, scores))
+    agreement = sum((a > 0.5) == (b > 0.5) for a, b in zip(eager, scores)) / len(texts)
+    return difference, agreement
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the spam classifiers for faster CPU inference")
+    parser.add_argument('--models', nargs='+', default=list(CLASSIFIERS.checkpoints),
+                        choices=list(CLASSIFIERS.checkpoints))
+    parser.add_argument('--runtimes', nargs='+', default=['torchscript', 'torchscript-int8'],
+                        choices=list(RUNTIME_SUFFIXES))
+    parser.add_argument('--check', action='store_true', help="only check existing exports against eager")
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.models:
+        if not args.check:
+            export(name, args.runtimes)
+        for runtime in args.runtimes:
+            result = check_parity(name, runtime)
+            if result is None:
+                print(f"{name} {runtime}: no up to date export to check")
+                failed = True
+                continue
+            difference, agreement = result
+            ok = difference <= TOLERANCE[runtime]
+            failed = failed or not ok
+            print(f"{name} {runtime}: max difference {difference:.2e}, labels agree on "
+                  f"{agreement:.0%} of {len(parity_texts())} texts{'' if ok else ', FAILED'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
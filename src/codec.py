@@ -0,0 +1,55 @@
+import numpy as np
+
+# G.711 mu-law, bit-exact with audioop.ulaw2lin / audioop.lin2ulaw for 16-bit samples
+ULAW_BIAS = 0x84
+ULAW_CLIP = 8159
+
+def _build_decode_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    t = ((u & 0x0F) << 3) + ULAW_BIAS
+    t <<= (u & 0x70) >> 4
+    return np.where(u & 0x80, ULAW_BIAS - t, t - ULAW_BIAS).astype(np.int16)
+
+def _build_encode_table():
+    # Indexed by the int16 sample reinterpreted as uint16
+    pcm = np.arange(65536, dtype=np.int32)
+    pcm = np.where(pcm >= 32768, pcm - 65536, pcm) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), ULAW_CLIP) + (ULAW_BIAS >> 2)
+    segment_ends = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+    segment = np.searchsorted(segment_ends, magnitude)
+    mantissa = (magnitude >> (np.minimum(segment, 7) + 1)) & 0x0F
+    uval = np.where(segment >= 8, 0x7F, (segment << 4) | mantissa)
+    return (uval ^ mask).astype(np.uint8)
+
+# Every uint8/uint16 index is in range, so np.take(..., mode='clip') can write into
+# out directly instead of through the temporary it uses for bounds checking
+ULAW_DECODE_TABLE = _build_decode_table()
+ULAW_ENCODE_TABLE = _build_encode_table()
+
+def ulaw_decode(data, out=None):
+    """Decode mu-law bytes to int16 PCM
+
+    data may be bytes or a uint8 array of any shape. If out is given it must be
+    an int16 array with data's number of elements and is filled in place.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = np.frombuffer(data, dtype=np.uint8)
+    if out is None:
+        return ULAW_DECODE_TABLE[data]
+    np.take(ULAW_DECODE_TABLE, data, out=out if out.shape == data.shape else out.reshape(data.shape), mode='clip')
+    return out
+
+def ulaw_encode(pcm, out=None):
+    """Encode int16 PCM to mu-law bytes
+
+    pcm may be bytes or an int16 array of any shape. If out is given it must be
+    a uint8 array with pcm's number of elements and is filled in place.
+    """
+    if isinstance(pcm, (bytes, bytearray, memoryview)):
+        pcm = np.frombuffer(pcm, dtype=np.int16)
+    indices = pcm.view(np.uint16)
+    if out is None:
+        return ULAW_ENCODE_TABLE[indices]
+    np.take(ULAW_ENCODE_TABLE, indices, out=out if out.shape == indices.shape else out.reshape(indices.shape), mode='clip')
+    return out
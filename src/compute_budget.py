@@ -0,0 +1,149 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Workload classes in priority order, with the share of the cores each may use at once
+WORKLOADS = {
+    'call_asr': 0.5,
+    'call_scoring': 0.25,
+    'sms_scoring': 0.25,
+    'context_search': 0.25,
+}
+
+def available_cores():
+    """COMPUTE_CORES, or every core"""
+    return int(os.getenv('COMPUTE_CORES') or 0) or os.cpu_count() or 1
+
+class WorkloadStats:
+    def __init__(self):
+        self.runs = 0
+        self.busy = 0.0          # seconds spent running
+        self.thread_seconds = 0.0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+class ComputeBudget:
+    """Shares the CPU cores between the torch workloads by priority
+
+    Each workload class gets a thread budget. run(name) waits until that many
+    cores are free, sets torch's intra-op thread count to the budget and gives
+    the cores back when the block exits. The thread count is process-wide, so
+    it is set on every entry rather than restored on exit, where overlapping
+    runs would undo each other. Waiting workloads are granted strictly in
+    WORKLOADS order, and the lower classes never use the cores budgeted for live
+    call ASR, so a context search can't stall a call.
+
+    The budget only covers the process it lives in. When ASR runs in worker
+    processes, reserve_for_workers() hands ASR's cores to them and leaves this
+    process the rest, so together they don't oversubscribe the machine.
+    """
+    def __init__(self, cores=None, shares=WORKLOADS):
+        self.shares = shares
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.tickets = itertools.count()
+        self.configure(cores)
+
+    def configure(self, cores=None, shares=None):
+        """Set the number of cores to share, defaults to COMPUTE_CORES or every core"""
+        cores = cores or available_cores()
+        with self.condition:
+            self.shares = shares or self.shares
+            self.cores = cores
+            self.budgets = {name: max(1, round(cores * share)) for name, share in self.shares.items()}
+            self.in_use = {name: 0 for name in self.shares}
+            self.waiting = []
+            self.stats_by_class = {name: WorkloadStats() for name in self.shares}
+            self.started = time.time()
+
+    def priority(self, name):
+        return list(self.shares).index(name)
+
+    def can_run(self, name, threads):
+        top = next(iter(self.shares))
+        free = self.cores - sum(self.in_use.values())
+        if name != top:
+            # Keep the rest of live call ASR's budget free for it
+            free -= self.budgets[top] - self.in_use[top]
+        # A workload that has the cores to itself runs even if its budget is bigger
+        return threads <= free or not any(self.in_use.values())
+
+    def acquire(self, name):
+        threads = self.budgets[name]
+        ticket = (self.priority(name), next(self.tickets), name)
+        start = time.time()
+        with self.condition:
+            self.waiting.append(ticket)
+            while min(self.waiting) != ticket or not self.can_run(name, threads):
+                self.condition.wait()
+            self.waiting.remove(ticket)
+            self.in_use[name] += threads
+            # Let the next waiter check whether it fits as well
+            self.condition.notify_all()
+            waited = time.time() - start
+            stats = self.stats_by_class[name]
+            stats.total_wait += waited
+            stats.max_wait = max(stats.max_wait, waited)
+        return threads
+
+    def release(self, name, threads, busy):
+        with self.condition:
+            self.in_use[name] -= threads
+            stats = self.stats_by_class[name]
+            stats.runs += 1
+            stats.busy += busy
+            stats.thread_seconds += busy * threads
+            self.condition.notify_all()
+
+    @contextmanager
+    def run(self, name):
+        if getattr(self.local, 'name', None) is not None or name not in self.budgets:
+            # Already inside a budgeted block on this thread, e.g. a backend called by a
+            # scheduler, or a class whose cores belong to worker processes
+            yield
+            return
+        threads = self.acquire(name)
+        import torch
+        torch.set_num_threads(threads)
+        self.local.name = name
+        start = time.time()
+        try:
+            yield
+        finally:
+            busy = time.time() - start
+            self.local.name = None
+            self.release(name, threads, busy)
+
+    def stats(self):
+        """Per class runs, thread budget, share of all core-time used and wait times"""
+        with self.condition:
+            elapsed = max(time.time() - self.started, 1e-9)
+            report = {}
+            for name, stats in self.stats_by_class.items():
+                report[name] = {
+                    'threads': self.budgets[name],
+                    'runs': stats.runs,
+                    'busy_s': round(stats.busy, 3),
+                    'utilisation': round(stats.thread_seconds / (elapsed * self.cores), 4),
+                    'mean_wait_s': round(stats.total_wait / stats.runs, 4) if stats.runs else 0.0,
+                    'max_wait_s': round(stats.max_wait, 4),
+                    'waiting': sum(1 for ticket in self.waiting if ticket[2] == name),
+                }
+            return report
+
+COMPUTE = ComputeBudget()
+
+def reserve_for_workers(processes, cores=None):
+    """Give live call ASR's share of the cores to worker processes, returns cores per worker
+
+    This process's budget is reconfigured to the remaining cores, shared between
+    the other classes in the same proportions as before.
+    """
+    cores = cores or available_cores()
+    worker_cores = min(cores - 1, max(processes, round(cores * WORKLOADS['call_asr'])))
+    rest = 1 - WORKLOADS['call_asr']
+    COMPUTE.configure(max(1, cores - worker_cores),
+                      {name: share / rest for name, share in WORKLOADS.items() if name != 'call_asr'})
+    return max(1, worker_cores // processes)
@@ -1,25 +1,43 @@
 from codecs import ignore_errors
 import os
-from sentence_transformers import SentenceTransformer
-import faiss
+import threading
 import numpy as np
 import requests
 import time
 import random
-import matplotlib.pyplot as plt
+from src.compute_budget import COMPUTE
 
 PHONE_TRANSCRIPT_DIR = "outputs/phone_calls"
 MESSAGE_DIR = "outputs/messages"
 BROWSER_DIR = "C:/Users/gaura/Downloads/Scraper/Output"
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# sentence_transformers and faiss are slow to import, so they load on first use
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def load_embedder():
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            from sentence_transformers import SentenceTransformer
+            _embedder = SentenceTransformer(EMBEDDING_MODEL)
+    return _embedder
+
+def warmup():
+    with COMPUTE.run('context_search'):
+        load_embedder().encode(["warm up"])
 
 def do_semantic_search(query, documents):
     if not documents:
         return None
         
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    import faiss
+    model = load_embedder()
     
-    doc_embeddings = model.encode([doc['content'] for doc in documents])
-    query_embedding = model.encode([query])[0]
+    with COMPUTE.run('context_search'):
+        doc_embeddings = model.encode([doc['content'] for doc in documents])
+        query_embedding = model.encode([query])[0]
     
     # Create FAISS index for efficient similarity search
     vector_dimension = len(query_embedding)
@@ -245,6 +263,7 @@ def run_tests():
     print(percentage_with_description)
     print(percentage_without_description)
 
+    import matplotlib.pyplot as plt
     plt.plot(num_files, percentage_with_description, label='With Semantic Search')
     plt.plot(num_files, percentage_without_description, label='Without Semantic Search')
     plt.xlabel("Number of documents")
@@ -13,7 +13,10 @@ from src.context_search import find_context
 import json
 from twilio.rest import Client
 from src.twilio_text import TwilioSMS
-from src.model import predict_label, predict_call_spam
+from src.model import models_ready
+from src.call_risk import CallRiskWorker
+from src.compute_budget import COMPUTE
+from src.score_cache import sms_spam_scores
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -27,6 +30,9 @@ class StyleFrame(QFrame):
 class TranscriptionSignals(QObject):
     mic_transcription_ready = pyqtSignal(str)
     mix_transcription_ready = pyqtSignal(str)
+    session_transcription_ready = pyqtSignal(str, str)
+    mic_partial_ready = pyqtSignal(str)
+    mix_partial_ready = pyqtSignal(str)
     call_status_changed = pyqtSignal(str)
     incoming_call = pyqtSignal(str, str, str)
     incoming_msg = pyqtSignal(str, str)
@@ -725,6 +731,11 @@ class MessageScreen(QWidget):
         file_path = os.path.join(output_dir, f"{phone_number}.txt")
         with open(file_path, "r") as f:
             lines = f.readlines()
+
+        # Scores come from the cache in bulk; messages without one are scored in one
+        # batched call once the classifiers have loaded
+        incoming = [line.strip()[len("Input:"):].strip() for line in lines if line.strip().startswith("Input:")]
+        spam_probs = iter(score or 0.0 for score in sms_spam_scores(incoming, infer=models_ready('sms')))
             
         for line in lines:
             line = line.strip()
@@ -738,7 +749,7 @@ class MessageScreen(QWidget):
                 message = line[len("Input:"):].strip()
                 message_widget = self.create_message_label(message, is_output=False)
                 self.chat_layout.addWidget(message_widget)
-                spam_prob = predict_label(message)
+                spam_prob = next(spam_probs)
                 if spam_prob > 0.9:
                     spam_label = self.create_spam_label(spam_prob)
                     self.chat_layout.addWidget(spam_label)
@@ -850,18 +861,32 @@ class MessageScreen(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to send message: {str(e)}")
 
 class MainWindow(QMainWindow):
-    def __init__(self, audio_recorder, signals):
+    def __init__(self, audio_recorder, signals, startup=None):
         super().__init__()
         self.audio_recorder = audio_recorder
         self.signals = signals
         self.status_text = ["No active call", "", "Ready to record"]
         self.signals.mic_transcription_ready.connect(self.update_mic_transcript)
         self.signals.mix_transcription_ready.connect(self.update_mix_transcript)
+        self.signals.mic_partial_ready.connect(lambda text: self.update_partial_transcript("Input", text))
+        self.signals.mix_partial_ready.connect(lambda text: self.update_partial_transcript("Output", text))
         self.signals.call_status_changed.connect(self.update_call_status)
         self.signals.incoming_call.connect(self.handle_incoming_call)
         self.signals.incoming_msg.connect(self.handle_incoming_msg)
         self.last_prefix = None
+        # Scam scoring of the call transcript runs off the GUI thread
+        self.call_risk = CallRiskWorker()
+        self.call_risk.risk_updated.connect(self.update_call_risk)
         self.setup_ui()
+
+        # Features whose models are still loading stay disabled until they are ready
+        if startup is not None:
+            startup.feature_ready.connect(self.set_feature_ready)
+            startup.feature_failed.connect(self.set_feature_failed)
+            if not startup.is_ready('transcription'):
+                self.record_button.setEnabled(False)
+                self.status_text[2] = "Loading speech recognition..."
+                self.update_status_label()
         
     def setup_ui(self):
         self.setWindowTitle("Vigilis: Stay Protected against Fraud")
@@ -1019,6 +1044,7 @@ class MainWindow(QMainWindow):
         if status == "start":
             self.timer.start(1000)  # Update every second
             self.transcript_area.clear()
+            self.call_risk.reset()
         elif status == "stop":
             self.timer.stop()
             self.stop_recording(self.caller_number)
@@ -1101,6 +1127,13 @@ class MainWindow(QMainWindow):
             }
         """)
         transcript_layout.addWidget(self.transcript_area)
+
+        # Words still being recognised when streaming transcription is enabled
+        self.partial_label = QLabel()
+        self.partial_label.setStyleSheet("color: gray; font-style: italic;")
+        self.partial_label.setWordWrap(True)
+        self.partial_label.setVisible(False)
+        transcript_layout.addWidget(self.partial_label)
         layout.addWidget(transcript_frame)
 
     def toggle_recording(self):
@@ -1121,6 +1154,10 @@ class MainWindow(QMainWindow):
             print(call_number)
             message = self.audio_recorder.stop_recording(transcript, call_number)
             self.status_label.setText(message)
+            print(f"Call risk stats: {self.call_risk.stats()}")
+            print(f"Compute budget stats: {COMPUTE.stats()}")
+            if self.audio_recorder.last_directory:
+                self.call_risk.save_timeline(f"{self.audio_recorder.last_directory}/risk_timeline.json")
             self.record_button.setText("Start Recording")
             self.record_button.setStyleSheet("")
             self.timer.stop()
@@ -1131,6 +1168,23 @@ class MainWindow(QMainWindow):
             self.update_status_label()
             self.update_end_call_button(False)
 
+    def set_feature_ready(self, name):
+        if name == 'transcription':
+            self.record_button.setEnabled(True)
+            if not self.audio_recorder.is_recording:
+                self.status_text[2] = "Ready to record"
+                self.update_status_label()
+        elif name == 'sms_classifier':
+            # Re-render the open conversation with its spam labels
+            current = self.message_screen.phone_list.currentItem()
+            if self.stacked_widget.currentIndex() == 2 and current:
+                self.message_screen.load_chat_history(current, None)
+
+    def set_feature_failed(self, name, error):
+        if name == 'transcription':
+            self.status_text[2] = f"Speech recognition unavailable: {error}"
+            self.update_status_label()
+
     def update_mic_transcript(self, text):
         if text.strip():
             self._update_transcript_area("Input", text.strip())
@@ -1139,6 +1193,13 @@ class MainWindow(QMainWindow):
         if text.strip():
             self._update_transcript_area("Output", text.strip())
         
+    def update_partial_transcript(self, prefix, text):
+        if text.strip():
+            self.partial_label.setText(f"{prefix}: {text.strip()}...")
+            self.partial_label.setVisible(True)
+        else:
+            self.partial_label.setVisible(False)
+
     def _update_transcript_area(self, prefix, content):
         cursor = self.transcript_area.textCursor()
         cursor.movePosition(cursor.MoveOperation.End)
@@ -1152,21 +1213,12 @@ class MainWindow(QMainWindow):
             else:
                 if current_text[-1] not in ['.', '!', '?']:
                     cursor.insertHtml(f".<br><b>{prefix}</b>: {content.replace('.', '')}")
-                    current_text += f".\n{prefix}: {content}"
                 else:
                     cursor.insertHtml(f"<br><b>{prefix}</b>: {content.replace('.', '')}")
-                    current_text += f"\n{prefix}: {content}"
-                spam = predict_call_spam(current_text[max(0, len(current_text)-700):])
-                print(spam)
-                if spam > 0.8 and not hasattr(self, '_spam_warning_shown'):
-                    cursor.insertHtml(f"<br><span style='color: red; font-weight: bold;'>POTENTIAL SCAM DETECTED</span>")
-                    self._spam_warning_shown = True
-                    QTimer.singleShot(100, lambda: self._show_spam_warning(spam))
         else:
             cursor.insertHtml(f"<b>{prefix}</b>: {content.replace('.', '')}")
-            current_text += f"\n{prefix}: {content}"
             
-        
+        self.call_risk.add_utterance(prefix, content)
         self.last_prefix = prefix
         
         # Update scroll position
@@ -1175,6 +1227,16 @@ class MainWindow(QMainWindow):
             self.transcript_area.verticalScrollBar().maximum()
         )
 
+    def update_call_risk(self, spam, latency):
+        print(f"Call risk {spam:.2f}, {latency:.2f} seconds after the utterance")
+        if spam > 0.8 and not hasattr(self, '_spam_warning_shown'):
+            cursor = self.transcript_area.textCursor()
+            cursor.movePosition(cursor.MoveOperation.End)
+            cursor.insertHtml(f"<br><span style='color: red; font-weight: bold;'>POTENTIAL SCAM DETECTED</span>")
+            self.transcript_area.setTextCursor(cursor)
+            self._spam_warning_shown = True
+            QTimer.singleShot(100, lambda: self._show_spam_warning(spam))
+
     def update_end_call_button(self, enabled):
         """Update end call button style based on enabled state"""
         if enabled:
@@ -0,0 +1,99 @@
+import threading
+import queue
+import time
+from src.asr_backends import WHISPER_MODEL, make_backend
+
+class InferenceRequest:
+    def __init__(self, audio, callback):
+        self.audio = audio
+        self.callback = callback
+        self.submitted = time.time()
+
+class InferenceScheduler:
+    """Runs Whisper for many transcribers as batched decodes on one thread
+
+    Transcribers submit ready 16kHz float32 windows with a callback. The worker
+    takes the first waiting window, keeps collecting until max_batch windows are
+    queued or max_wait seconds have passed, decodes them as one batch and passes
+    each text to its callback in submission order.
+    """
+    def __init__(self, model_name=WHISPER_MODEL, max_batch=8, max_wait=0.05, backend='whisper'):
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.backend = make_backend(backend, model_name).load()
+        self.requests = queue.Queue()
+        self.should_stop = False
+
+        self.batches = 0
+        self.windows = 0
+        self.total_wait = 0.0
+        self.total_decode = 0.0
+
+        self.worker_thread = threading.Thread(target=self.worker, daemon=True)
+        self.worker_thread.start()
+
+    def submit(self, audio, callback):
+        self.requests.put(InferenceRequest(audio, callback))
+
+    def collect(self):
+        try:
+            batch = [self.requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def worker(self):
+        while not self.should_stop:
+            batch = self.collect()
+            if not batch:
+                continue
+            now = time.time()
+            self.total_wait += sum(now - request.submitted for request in batch)
+            try:
+                texts = self.decode_batch([request.audio for request in batch])
+            except Exception as e:
+                print(f"Error decoding batch of {len(batch)}: {e}")
+                continue
+            for request, text in zip(batch, texts):
+                # One stream's failing callback mustn't stop the worker for every stream
+                try:
+                    request.callback(text)
+                except Exception as e:
+                    print(f"Error delivering transcription: {e}")
+
+    def decode_batch(self, windows):
+        start = time.time()
+        texts = self.backend.transcribe_batch(windows)
+        elapsed = time.time() - start
+
+        self.batches += 1
+        self.windows += len(windows)
+        self.total_decode += elapsed
+        print(f"Transcribed batch of {len(windows)} in {elapsed:.2f} seconds")
+        return texts
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'windows': self.windows,
+            'mean_batch': self.windows / self.batches if self.batches else 0.0,
+            'mean_decode_s': self.total_decode / self.batches if self.batches else 0.0,
+            'decode_s_per_window': self.total_decode / self.windows if self.windows else 0.0,
+            'mean_wait_s': self.total_wait / self.windows if self.windows else 0.0,
+            'queued': self.requests.qsize(),
+        }
+
+    def stop(self):
+        if not self.should_stop:
+            self.should_stop = True
+            self.backend.release()
@@ -0,0 +1,183 @@
+import threading
+import numpy as np
+
+FRAME_MS = 20
+FRAME_SAMPLES = 160  # 20ms at 8kHz
+
+class JitterBuffer:
+    """Adaptive playout buffer for inbound Twilio media
+
+    Frames are placed by their media chunk number (or, for payloads of several
+    frames, their media timestamp rounded to frames since the first one, then
+    arrival order) so bursts and reordering are absorbed. The chunk number only
+    counts media messages, unlike the stream's sequenceNumber which also counts
+    marks and DTMF, and timestamps jitter by a few ms so they are never floored
+    into slots. Playout
+    starts once target_delay frames are buffered; gaps are concealed by fading
+    out the previous frame, and the target delay grows after gaps and shrinks
+    again while playout is smooth. Whenever more than max_delay frames are
+    waiting the buffer skips ahead to cap latency.
+    """
+    def __init__(self, frame_samples=FRAME_SAMPLES, frame_ms=FRAME_MS,
+                 min_delay=2, max_delay=10, start_delay=3, max_concealed=3,
+                 shrink_after=250):
+        self.frame_samples = frame_samples
+        self.frame_ms = frame_ms
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_delay = start_delay
+        self.max_concealed = max_concealed
+        self.shrink_after = shrink_after
+
+        self._frames = {}
+        self._lock = threading.Lock()
+        self._first_timestamp = None
+        self._next_slot = None
+        self._highest_slot = None
+        self._arrivals = 0
+        self._playing = False
+        self._last_frame = None
+        self._concealed_run = 0
+        self._smooth_run = 0
+
+        self.received = 0
+        self.played = 0
+        self.late = 0
+        self.duplicates = 0
+        self.concealed = 0
+        self.underruns = 0
+        self.resyncs = 0
+        self.dropped = 0
+
+    def _slot(self, chunk, timestamp, frames):
+        # One message per frame is what Twilio sends, its chunk number is the slot
+        if chunk is not None and frames == 1:
+            return int(chunk)
+        if timestamp is not None:
+            if self._first_timestamp is None:
+                self._first_timestamp = int(timestamp)
+            return round((int(timestamp) - self._first_timestamp) / self.frame_ms)
+        if chunk is not None:
+            return int(chunk)
+        return self._arrivals
+
+    def put(self, frame, chunk=None, timestamp=None):
+        """Add a decoded (n, 1) int16 frame, splitting payloads longer than one frame"""
+        with self._lock:
+            frames = -(-len(frame) // self.frame_samples)
+            slot = self._slot(chunk, timestamp, frames)
+            for offset in range(0, len(frame), self.frame_samples):
+                self._put(slot, frame[offset:offset + self.frame_samples])
+                slot += 1
+            self._arrivals = slot
+
+    def _put(self, slot, frame):
+        self.received += 1
+        if self._next_slot is not None and slot < self._next_slot:
+            self.late += 1
+            return
+        if slot in self._frames:
+            self.duplicates += 1
+            return
+
+        self._frames[slot] = frame
+        if self._highest_slot is None or slot > self._highest_slot:
+            self._highest_slot = slot
+
+        if self._playing:
+            if self._highest_slot - self._next_slot + 1 > self.max_delay:
+                self._resync()
+        elif len(self._frames) > self.max_delay:
+            # Nobody is playing yet, keep only the newest frames
+            oldest = min(self._frames)
+            del self._frames[oldest]
+            self._next_slot = oldest + 1
+            self.dropped += 1
+
+    def _resync(self):
+        """Drop the oldest frames so only target_delay frames remain queued"""
+        self._next_slot = self._highest_slot - self.target_delay + 1
+        for slot in [s for s in self._frames if s < self._next_slot]:
+            del self._frames[slot]
+            self.dropped += 1
+        self.resyncs += 1
+
+    def get(self):
+        """Return the next frame to play, or None for silence"""
+        with self._lock:
+            if not self._playing:
+                if len(self._frames) < self.target_delay:
+                    return None
+                self._playing = True
+                self._next_slot = min(self._frames)
+
+            frame = self._frames.pop(self._next_slot, None)
+            if frame is not None:
+                self._next_slot += 1
+                self._last_frame = frame
+                self._concealed_run = 0
+                self.played += 1
+                self._adapt_smooth()
+                return frame
+
+            self._smooth_run = 0
+            if not self._frames:
+                # Nothing left to play, wait for target_delay frames before resuming
+                self.underruns += 1
+                self._playing = False
+                self._grow()
+                return None
+
+            # A frame is missing but later ones have arrived
+            self._next_slot += 1
+            self.concealed += 1
+            self._grow()
+            return self._conceal()
+
+    def _conceal(self):
+        if self._last_frame is None or self._concealed_run >= self.max_concealed:
+            return None
+        self._concealed_run += 1
+        gain = 0.5 ** self._concealed_run
+        return (self._last_frame * gain).astype(np.int16)
+
+    def _grow(self):
+        self.target_delay = min(self.max_delay, self.target_delay + 1)
+
+    def _adapt_smooth(self):
+        self._smooth_run += 1
+        if self._smooth_run < self.shrink_after or self.target_delay <= self.min_delay:
+            return
+        self._smooth_run = 0
+        self.target_delay -= 1
+        # Skip one queued frame so the extra latency actually goes away
+        if len(self._frames) > self.target_delay:
+            if self._frames.pop(self._next_slot, None) is not None:
+                self.dropped += 1
+            self._next_slot += 1
+
+    def depth(self):
+        with self._lock:
+            return len(self._frames)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._playing = False
+
+    def stats(self):
+        with self._lock:
+            depth = len(self._frames)
+            return {
+                'depth': depth,
+                'depth_ms': depth * self.frame_ms,
+                'target_delay_ms': self.target_delay * self.frame_ms,
+                'received': self.received,
+                'played': self.played,
+                'late': self.late,
+                'duplicates': self.duplicates,
+                'concealed': self.concealed,
+                'underruns': self.underruns,
+                'resyncs': self.resyncs,
+                'dropped': self.dropped,
+            }
@@ -0,0 +1,82 @@
+import base64
+import json
+import os
+import struct
+import time
+
+# Capture file layout: MAGIC, then one record per websocket message
+#   event (B), arrival offset in ms (I), sequenceNumber (I), media timestamp (I),
+#   body length (H), body
+# Media bodies are the raw mu-law bytes, every other event keeps its JSON text.
+MAGIC = b'VMC1'
+RECORD = struct.Struct('<BIIIH')
+EVENTS = ['start', 'media', 'stop', 'other']
+
+class MediaCaptureWriter:
+    """Writes the Twilio media events of one websocket to a compact capture file"""
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.started = None
+        self.records = 0
+
+    def write(self, message, data=None, received=None):
+        if self.file is None:
+            return
+        received = received if received is not None else time.perf_counter()
+        if self.started is None:
+            self.started = received
+        data = data if data is not None else json.loads(message)
+
+        event = data.get('event')
+        sequence_number = int(data.get('sequenceNumber') or 0)
+        timestamp = 0
+        if event == 'media':
+            media = data['media']
+            timestamp = int(media.get('timestamp') or 0)
+            body = base64.b64decode(media['payload'])
+        else:
+            body = message.encode('utf-8') if isinstance(message, str) else message
+        kind = EVENTS.index(event) if event in EVENTS[:3] else EVENTS.index('other')
+
+        offset_ms = int((received - self.started) * 1000)
+        self.file.write(RECORD.pack(kind, offset_ms, sequence_number, timestamp, len(body)))
+        self.file.write(body)
+        self.records += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def read_capture(path):
+    """Yield (offset in seconds, Twilio JSON message) for every record in a capture"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a media capture")
+        stream_sid = None
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            kind, offset_ms, sequence_number, timestamp, length = RECORD.unpack(header)
+            body = f.read(length)
+            if EVENTS[kind] != 'media':
+                message = body.decode('utf-8')
+                if EVENTS[kind] == 'start':
+                    stream_sid = json.loads(message)['start']['streamSid']
+                yield offset_ms / 1000, message
+                continue
+
+            yield offset_ms / 1000, json.dumps({
+                "event": "media",
+                "sequenceNumber": str(sequence_number),
+                "streamSid": stream_sid,
+                "media": {
+                    "track": "inbound",
+                    "timestamp": str(timestamp),
+                    "payload": base64.b64encode(body).decode('utf-8')
+                }
+            })
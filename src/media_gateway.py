@@ -0,0 +1,234 @@
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import numpy as np
+import websockets
+from src.media_capture import MediaCaptureWriter
+
+MEDIA_PATH = '/media'
+# Seconds a send from another thread may wait for the gateway loop
+SEND_TIMEOUT = 2.0
+
+def process_audio_payload(payload):
+    """Process base64 encoded mulaw audio data from Twilio"""
+    try:
+        audio_bytes = base64.b64decode(payload)
+        audio_data = np.frombuffer(audio_bytes, dtype=np.uint8)
+        return audio_data
+    except Exception as e:
+        print(f"Error processing audio payload: {e}")
+        return None
+
+class MediaConnection:
+    """Handles the Twilio media events arriving on one websocket
+
+    Shared by the Flask route and the asyncio gateway so both behave the same.
+    on_start and on_stop are called when the connection's session becomes or
+    stops being the call attached to the main window. If capture_dir is set the
+    stream is also written to <capture_dir>/<streamSid>.vmc for later replay.
+    """
+    def __init__(self, recorder, ws, on_start=None, on_stop=None, capture_dir=None):
+        self.recorder = recorder
+        self.ws = ws
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.capture_dir = capture_dir
+        self.capture = None
+        self.session = None
+
+    def handle(self, message, received=None):
+        """Handle one raw websocket message, returns False once the stream has stopped"""
+        data = json.loads(message)
+        event = data.get('event')
+        if event == 'start' and self.capture_dir:
+            self.capture = MediaCaptureWriter(
+                os.path.join(self.capture_dir, f"{data['start']['streamSid']}.vmc"))
+        if self.capture is not None:
+            self.capture.write(message, data, received)
+
+        if event == 'start':
+            # Extract caller information from start event
+            caller_number = data['start']['customParameters']['caller_number']
+            self.session = self.recorder.start_call(data['start']['streamSid'], self.ws, caller_number)
+            if self.recorder.is_active(self.session.stream_sid) and self.on_start:
+                self.on_start()
+
+        elif event == 'media' and 'media' in data:
+            if self.session is None:
+                return True
+            media = data['media']
+            audio_data = process_audio_payload(media['payload'])
+            if audio_data is not None:
+                # media.chunk counts only media messages, sequenceNumber counts every event
+                self.session.process_audio(audio_data, media.get('chunk'), media.get('timestamp'))
+
+        elif event == 'stop':
+            print("Received stop event")
+            return False
+        return True
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.close()
+        # Tear down only this connection's session so other calls keep streaming
+        session = self.session
+        if session is None or session.stream_sid not in self.recorder.sessions:
+            return
+        was_active = self.recorder.is_active(session.stream_sid)
+        # stop_call hands the recording to the window before on_stop saves it
+        self.recorder.stop_call(session.stream_sid)
+        if was_active and self.on_stop:
+            self.on_stop()
+
+class GatewayWebSocket:
+    """Blocking send/close facade over an asyncio websocket
+
+    Sessions and the audio callbacks call ws.send from ordinary threads. Sends
+    are scheduled onto the gateway loop and waited for, so a slow socket holds
+    up the calling thread (and MediaSender's bounded queue) and send errors are
+    raised to the caller. Never call these from the gateway loop itself.
+    """
+    def __init__(self, websocket, loop, timeout=SEND_TIMEOUT):
+        self.websocket = websocket
+        self.loop = loop
+        self.timeout = timeout
+
+    def _wait(self, coroutine):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def send(self, message):
+        return self._wait(self.websocket.send(message))
+
+    def close(self):
+        return self._wait(self.websocket.close())
+
+class MediaGateway:
+    """Serves Twilio media websockets from a single asyncio event loop
+
+    Reading sockets is the only work done on the loop. Parsing, decoding and
+    handing frames to the sessions runs on a small thread pool, one batch of
+    queued messages per connection at a time so frame order is preserved.
+    """
+    def __init__(self, recorder, host='0.0.0.0', port=5001, workers=4,
+                 on_start=None, on_stop=None, capture_dir=None):
+        self.recorder = recorder
+        self.capture_dir = capture_dir
+        self.host = host
+        self.port = port
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media')
+        self.loop = None
+        self.thread = None
+        self._stop_event = None
+        self._ready = threading.Event()
+
+        # Batches are handled on several executor threads at once
+        self.stats_lock = threading.Lock()
+        self.connections = 0
+        self.frames = 0
+        self.batches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        return self.thread
+
+    def run(self):
+        asyncio.run(self._serve())
+
+    def stop(self):
+        if self.loop and self._stop_event:
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        async with websockets.serve(self._handler, self.host, self.port):
+            print(f"Media gateway listening on ws://{self.host}:{self.port}{MEDIA_PATH}")
+            self._ready.set()
+            await self._stop_event.wait()
+        self.executor.shutdown(wait=False)
+
+    async def _handler(self, websocket):
+        if getattr(websocket, 'path', MEDIA_PATH).split('?')[0] != MEDIA_PATH:
+            await websocket.close(code=1008, reason="Unknown path")
+            return
+
+        print("WebSocket connected")
+        self.connections += 1
+        connection = MediaConnection(self.recorder, GatewayWebSocket(websocket, self.loop),
+                                     on_start=self.on_start, on_stop=self.on_stop,
+                                     capture_dir=self.capture_dir)
+        pending = asyncio.Queue()
+        worker = asyncio.create_task(self._drain(connection, pending))
+        try:
+            async for message in websocket:
+                pending.put_nowait((time.perf_counter(), message))
+                if worker.done():
+                    break
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pending.put_nowait(None)
+            await worker
+            await self.loop.run_in_executor(self.executor, connection.close)
+            self.connections -= 1
+
+    async def _drain(self, connection, pending):
+        while True:
+            batch = [await pending.get()]
+            while not pending.empty():
+                batch.append(pending.get_nowait())
+
+            done = batch[-1] is None
+            messages = [item for item in batch if item is not None]
+            if messages:
+                running = await self.loop.run_in_executor(self.executor, self._handle_batch,
+                                                          connection, messages)
+                if not running:
+                    return
+            if done:
+                return
+
+    def _handle_batch(self, connection, messages):
+        running = True
+        total_latency = max_latency = 0.0
+        for received, message in messages:
+            try:
+                running = connection.handle(message, received)
+            except Exception as e:
+                print(f"Error handling media message: {e}")
+            latency = time.perf_counter() - received
+            total_latency += latency
+            max_latency = max(max_latency, latency)
+            if not running:
+                break
+        with self.stats_lock:
+            self.total_latency += total_latency
+            self.max_latency = max(self.max_latency, max_latency)
+            self.frames += len(messages)
+            self.batches += 1
+        return running
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'connections': self.connections,
+                'frames': self.frames,
+                'mean_batch': self.frames / self.batches if self.batches else 0.0,
+                'mean_latency_ms': 1000 * self.total_latency / self.frames if self.frames else 0.0,
+                'max_latency_ms': 1000 * self.max_latency,
+            }
@@ -0,0 +1,217 @@
+"""Replay captured Twilio media sessions to load-test the /media path
+
+Over the network, against a running Vigilis instance:
+    python -m src.media_replay outputs/captures/MZ123.vmc --sessions 20 --speed 4
+
+In process, through MediaConnection, AudioRecorder and Transcriber directly,
+which also measures transcript latency:
+    python -m src.media_replay outputs/captures/MZ123.vmc --in-process --sessions 4
+
+--speed 1 replays in real time, N replays N times faster and 0 as fast as possible.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from src.media_capture import read_capture
+
+def load_session(path, index):
+    """Read a capture and give its stream a unique streamSid for this replay"""
+    messages = []
+    suffix = f"-replay{index}"
+    for offset, message in read_capture(path):
+        data = json.loads(message)
+        if data.get('event') == 'start':
+            data['start']['streamSid'] += suffix
+        if 'streamSid' in data and data['streamSid']:
+            data['streamSid'] += suffix
+        messages.append((offset, data.get('event'), json.dumps(data)))
+    return messages
+
+def pace(started, offset, speed):
+    if speed <= 0:
+        return 0.0
+    delay = started + offset / speed - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    return delay
+
+class ReplayStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.errors = 0
+        self.late_sends = 0
+        self.transcripts = 0
+        self.first_transcript = []
+        self.tail_latency = []
+
+    def report(self, elapsed):
+        report = {
+            'sessions': self.sessions,
+            'elapsed_s': round(elapsed, 3),
+            'frames_sent': self.frames_sent,
+            'frames_per_s': round(self.frames_sent / elapsed, 1) if elapsed else 0.0,
+            'audio_s_per_s': round(self.frames_sent * 0.02 / elapsed, 2) if elapsed else 0.0,
+            'frames_dropped': self.frames_dropped,
+            'late_sends': self.late_sends,
+            'errors': self.errors,
+        }
+        if self.transcripts:
+            report['transcripts'] = self.transcripts
+        if self.first_transcript:
+            report['first_transcript_latency_s'] = round(sum(self.first_transcript) / len(self.first_transcript), 3)
+        if self.tail_latency:
+            report['final_transcript_latency_s'] = round(sum(self.tail_latency) / len(self.tail_latency), 3)
+        return report
+
+async def replay_websocket(url, messages, speed, stats):
+    import websockets
+
+    frames = sum(1 for _, event, _ in messages if event == 'media')
+    sent = 0
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(url) as websocket:
+            for offset, event, message in messages:
+                if speed > 0:
+                    delay = started + offset / speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elif delay < -0.1:
+                        stats.late_sends += 1
+                await websocket.send(message)
+                if event == 'media':
+                    sent += 1
+    except Exception as e:
+        print(f"Replay session failed: {e}")
+        stats.errors += 1
+    stats.frames_sent += sent
+    stats.frames_dropped += frames - sent
+
+async def replay_network(url, sessions, speed):
+    stats = ReplayStats()
+    stats.sessions = len(sessions)
+    started = time.perf_counter()
+    await asyncio.gather(*(replay_websocket(url, messages, speed, stats) for messages in sessions))
+    return stats.report(time.perf_counter() - started)
+
+class TranscriptProbe:
+    """Stands in for a transcription_ready signal and records when text arrives"""
+    def __init__(self):
+        self.times = []
+
+    def emit(self, *args):
+        self.times.append(time.perf_counter())
+
+class ReplayWebSocket:
+    def send(self, message):
+        pass
+
+    def close(self):
+        pass
+
+def replay_in_process(sessions, speed, transcribe=True, batched=False):
+    from src.audio_recorder import AudioRecorder
+    from src.call_session import SessionRegistry
+    from src.media_gateway import MediaConnection
+    from src.transcriber import Transcriber
+
+    scheduler = None
+    if transcribe and batched:
+        from src.inference_scheduler import InferenceScheduler
+        scheduler = InferenceScheduler()
+
+    def transcriber_factory(stream_sid):
+        return Transcriber(TranscriptProbe(), scheduler=scheduler)
+
+    registry = SessionRegistry(transcriber_factory if transcribe else None)
+    # The first session is handled as the main window's call, the rest as background calls
+    recorder = AudioRecorder(None, transcriber_factory(None) if transcribe else None, registry)
+
+    stats = ReplayStats()
+    stats.sessions = len(sessions)
+    timelines = []
+
+    def run(messages):
+        connection = MediaConnection(recorder, ReplayWebSocket())
+        frames = sum(1 for _, event, _ in messages if event == 'media')
+        first_frame = None
+        last_push = None
+        started = time.perf_counter()
+        for offset, event, message in messages:
+            if pace(started, offset, speed) < -0.1:
+                stats.late_sends += 1
+            if event == 'stop':
+                # Keep the session alive until its transcriber has caught up
+                break
+            connection.handle(message)
+            if event == 'media':
+                last_push = time.perf_counter()
+                first_frame = first_frame or last_push
+
+        session = connection.session
+        accepted = len(session.recording) // 160 if session else 0
+        with stats.lock:
+            stats.frames_sent += frames
+            stats.frames_dropped += frames - accepted
+        timelines.append((session, first_frame, last_push))
+
+    threads = [threading.Thread(target=run, args=(messages,)) for messages in sessions]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if transcribe:
+        # Give the transcribers time to finish their last window
+        time.sleep(3)
+    transcriber_stats = []
+    for session, first_frame, last_push in timelines:
+        if session is None:
+            continue
+        transcriber = session.current_transcriber()
+        probe = getattr(transcriber, 'transcription_ready', None)
+        if probe is not None and probe.times:
+            stats.transcripts += len(probe.times)
+            stats.first_transcript.append(probe.times[0] - first_frame)
+            stats.tail_latency.append(probe.times[-1] - last_push)
+        if transcriber is not None:
+            transcriber_stats.append(transcriber.stats())
+        # Remove directly rather than through stop_call so nothing is saved to outputs
+        registry.remove(session.stream_sid)
+    report = stats.report(elapsed)
+    if transcriber_stats:
+        report['max_lag_s'] = max(t['lag_s'] for t in transcriber_stats)
+        report['dropped_audio_s'] = sum(t['dropped_s'] + t['dropped_silence_s'] for t in transcriber_stats)
+    if scheduler is not None:
+        report['scheduler'] = scheduler.stats()
+        scheduler.stop()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured Twilio media sessions")
+    parser.add_argument('captures', nargs='+', help="Capture files written with MEDIA_CAPTURE_DIR")
+    parser.add_argument('--sessions', type=int, default=1, help="Concurrent sessions to replay")
+    parser.add_argument('--speed', type=float, default=1.0, help="1 is real time, 0 is as fast as possible")
+    parser.add_argument('--url', default='ws://localhost:5000/media')
+    parser.add_argument('--in-process', action='store_true', help="Drive the pipeline without a server")
+    parser.add_argument('--no-transcribe', action='store_true', help="Skip Whisper when replaying in process")
+    parser.add_argument('--batched', action='store_true', help="Decode all sessions through one InferenceScheduler")
+    args = parser.parse_args()
+
+    sessions = [load_session(args.captures[i % len(args.captures)], i) for i in range(args.sessions)]
+    if args.in_process:
+        report = replay_in_process(sessions, args.speed, transcribe=not args.no_transcribe,
+                                   batched=args.batched)
+    else:
+        report = asyncio.run(replay_network(args.url, sessions, args.speed))
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
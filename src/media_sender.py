@@ -0,0 +1,118 @@
+import base64
+import collections
+import json
+import threading
+import time
+import numpy as np
+from src.codec import ulaw_encode
+from src.ring_buffer import AudioRing
+from src.transcriber import TWILIO_SAMPLERATE
+
+class MediaSender:
+    """Encodes microphone audio and sends it to the active call off the audio thread
+
+    write() is called from the microphone callback. An encoder thread turns every
+    frames_per_message frames into one Twilio media message and puts it on a
+    queue of at most max_pending messages, dropping the oldest when full. A
+    sender thread drains that queue so a stalled websocket never blocks capture.
+    target is called to get the session to send to, or None while not in a call.
+    """
+    def __init__(self, target, frame_samples=160, frames_per_message=1, max_pending=50,
+                 ring_seconds=2):
+        self.target = target
+        self.message_samples = frame_samples * frames_per_message
+        self.ring = AudioRing(TWILIO_SAMPLERATE * ring_seconds, self.message_samples)
+        self.pending = collections.deque()
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.running = False
+        self.threads = []
+
+        self._ulaw = np.zeros(self.message_samples, dtype=np.uint8)
+
+        self.dropped = 0
+        self.sent = 0
+        self.send_errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def write(self, indata):
+        self.ring.write(indata)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.threads = [threading.Thread(target=self.encode_worker, daemon=True),
+                        threading.Thread(target=self.send_worker, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=1)
+        self.threads = []
+        self.pending.clear()
+
+    def encode_worker(self):
+        interval = self.message_samples / TWILIO_SAMPLERATE / 4
+        while self.running:
+            if self.ring.available() < self.message_samples:
+                time.sleep(interval)
+                continue
+
+            # Time the oldest sample in this message was captured
+            captured = time.perf_counter() - self.ring.available() / TWILIO_SAMPLERATE
+            session = self.target()
+            if session is None or session.ws is None:
+                self.ring.advance(self.message_samples)
+                continue
+
+            ulaw_encode(self.ring.peek(self.message_samples), out=self._ulaw)
+            self.ring.advance(self.message_samples)
+            message = json.dumps({
+                "event": "media",
+                "streamSid": session.stream_sid,
+                "media": {
+                    "payload": base64.b64encode(self._ulaw.tobytes()).decode('utf-8')
+                }
+            })
+            with self.condition:
+                if len(self.pending) >= self.max_pending:
+                    self.pending.popleft()
+                    self.dropped += 1
+                self.pending.append((captured, session.ws, message))
+                self.condition.notify()
+
+    def send_worker(self):
+        while self.running:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                captured, ws, message = self.pending.popleft()
+            try:
+                ws.send(message)
+            except Exception as e:
+                self.send_errors += 1
+                print(f"Error sending media: {e}")
+                continue
+            latency = time.perf_counter() - captured
+            self.sent += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def stats(self):
+        return {
+            'callback_overruns': self.ring.overruns,
+            'pending': len(self.pending),
+            'dropped': self.dropped,
+            'sent': self.sent,
+            'send_errors': self.send_errors,
+            'mean_send_latency_ms': 1000 * self.total_latency / self.sent if self.sent else 0.0,
+            'max_send_latency_ms': 1000 * self.max_latency,
+        }
@@ -1,13 +1,24 @@
+import hashlib
+import importlib.util
+import os
+import threading
+import weakref
+from functools import lru_cache
 import torch
-from transformers import AutoTokenizer, AutoModel
 from torch import nn
 import time
+from src.compute_budget import COMPUTE
 
 class BERTClassifier(nn.Module):
-  def __init__(self, bert_model_name, num_classes):
+  def __init__(self, bert_model_name, num_classes, config=None):
     super(BERTClassifier, self).__init__()
+    from transformers import AutoModel
     # self.bert = BertModel.from_pretrained(bert_model_name)
-    self.bert = AutoModel.from_pretrained('prajjwal1/bert-tiny')
+    if config is not None:
+      # Weights come from a checkpoint, so only the architecture is needed
+      self.bert = AutoModel.from_config(config)
+    else:
+      self.bert = AutoModel.from_pretrained(bert_model_name)
     self.dropout = nn.Dropout(0.1)
     self.fc = nn.Linear(self.bert.config.hidden_size, num_classes)
 
@@ -18,41 +29,214 @@ class BERTClassifier(nn.Module):
     logits = self.fc(x)
     return logits
 
-MODEL = BERTClassifier('prajjwal1/bert-tiny', 2)
-MODEL.load_state_dict(torch.load('models/bert_model_2.pth', weights_only=True, map_location='cpu'))
-TOKENIZER = AutoTokenizer.from_pretrained('prajjwal1/bert-tiny')
+BACKBONE = 'prajjwal1/bert-tiny'
+SMS_MODEL_PATH = 'models/bert_model_2.pth'
+CALL_MODEL_PATH = 'models/bert_model_calls.pth'
 
-CALL_MODEL = BERTClassifier('prajjwal1/bert-tiny', 2)
-CALL_MODEL.load_state_dict(torch.load('models/bert_model_calls.pth', map_location='cpu'))
+# Exported graphs written by python -m src.classifier_export, next to each checkpoint
+RUNTIME_SUFFIXES = {
+  'torchscript': '.ts.pt',
+  'torchscript-int8': '.int8.ts.pt',
+  'onnx': '.onnx',
+  'onnx-int8': '.int8.onnx',
+}
+# 'auto' only picks float32 exports, int8 ones change the scores slightly
+AUTO_RUNTIMES = ('onnx', 'torchscript')
 
-def predict_label(text, model=MODEL, tokenizer=TOKENIZER, device='cpu', max_length=512, k=1):
-    model.eval()
-    encoding = tokenizer(text, return_tensors='pt', max_length=max_length, padding='max_length', truncation=True)
-    input_ids = encoding['input_ids'].to(device)
-    attention_mask = encoding['attention_mask'].to(device)
+_prepared = weakref.WeakKeyDictionary()  # model -> device it was prepared for
 
-    with torch.no_grad():
-      model.to(device)
-      outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-      outputs = torch.softmax(outputs, dim=1)
-    return float(outputs[0][0])
+def artifact_path(checkpoint, runtime):
+  return os.path.splitext(checkpoint)[0] + RUNTIME_SUFFIXES[runtime]
 
-def predict_call_spam(text, model=CALL_MODEL, tokenizer=TOKENIZER, device='cpu', max_length=512, k=1):
-    start = time.time()
+class OnnxClassifier:
+  """An exported classifier run by onnxruntime, called like BERTClassifier"""
+  def __init__(self, path):
+    import onnxruntime
+    self.session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+  def __call__(self, input_ids, attention_mask):
+    logits = self.session.run(None, {'input_ids': input_ids.cpu().numpy(),
+                                     'attention_mask': attention_mask.cpu().numpy()})[0]
+    return torch.from_numpy(logits)
+
+  def eval(self):
+    return self
+
+  def to(self, device):
+    return self
+
+def load_exported(path, runtime):
+  if runtime.startswith('onnx'):
+    return OnnxClassifier(path)
+  return torch.jit.load(path, map_location='cpu')
+
+class ClassifierManager:
+  """Loads classifiers on first use, sharing one backbone config and tokenizer
+
+  get(name) builds the classifier from the shared config and loads its
+  checkpoint the first time it is asked for. Each classifier has its own lock,
+  so loading one never waits for the other. preload() loads them up front.
+
+  runtime is 'eager', one of RUNTIME_SUFFIXES or 'auto'. An exported runtime is
+  used for a classifier when its export is at least as new as the checkpoint,
+  otherwise that classifier falls back to eager PyTorch.
+  """
+  def __init__(self, checkpoints, backbone=BACKBONE, runtime='eager'):
+    self.checkpoints = checkpoints
+    self.backbone = backbone
+    self.runtime = runtime
+    self.config = None
+    self.tokenizer = None
+    self.models = {}
+    self.runtimes = {}
+    self.load_times = {}
+    self._shared_lock = threading.Lock()
+    self._locks = {name: threading.Lock() for name in checkpoints}
+
+  def get_tokenizer(self):
+    with self._shared_lock:
+      if self.tokenizer is None:
+        from transformers import AutoConfig, AutoTokenizer
+        self.config = AutoConfig.from_pretrained(self.backbone)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.backbone)
+    return self.tokenizer
+
+  def resolve_runtime(self, name):
+    """The runtime the named classifier runs in"""
+    if name in self.runtimes:
+      return self.runtimes[name]
+    checkpoint = self.checkpoints[name]
+    candidates = AUTO_RUNTIMES if self.runtime == 'auto' else (self.runtime,)
+    runtime = 'eager'
+    for candidate in candidates:
+      if candidate == 'eager':
+        break
+      path = artifact_path(checkpoint, candidate)
+      if candidate.startswith('onnx') and importlib.util.find_spec('onnxruntime') is None:
+        continue
+      if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(checkpoint):
+        runtime = candidate
+        break
+    if runtime == 'eager' and self.runtime not in ('eager', 'auto'):
+      print(f"No up to date {self.runtime} export of {checkpoint}, using eager PyTorch")
+    self.runtimes[name] = runtime
+    return runtime
+
+  def version(self, name):
+    """Checkpoint hash plus the runtime, since exports don't score exactly like eager"""
+    version = model_version(self.checkpoints[name])
+    runtime = self.resolve_runtime(name)
+    return version if runtime == 'eager' else f"{version}:{runtime}"
+
+  def load_eager(self, name):
+    """The named checkpoint as a BERTClassifier in eval mode"""
+    self.get_tokenizer()
+    model = BERTClassifier(self.backbone, 2, config=self.config)
+    model.load_state_dict(torch.load(self.checkpoints[name], weights_only=True, map_location='cpu'))
+    return model.eval()
+
+  def get(self, name):
+    model = self.models.get(name)
+    if model is not None:
+      return model
+    with self._locks[name]:
+      if name not in self.models:
+        start = time.time()
+        runtime = self.resolve_runtime(name)
+        if runtime == 'eager':
+          model = self.load_eager(name)
+        else:
+          self.get_tokenizer()
+          model = load_exported(artifact_path(self.checkpoints[name], runtime), runtime)
+        prepare(model)
+        self.load_times[name] = time.time() - start
+        self.models[name] = model
+        print(f"Loaded {name} classifier ({runtime}) in {self.load_times[name]:.2f} seconds")
+    return self.models[name]
+
+  def is_loaded(self, name):
+    return name in self.models
+
+  def preload(self, names=None):
+    for name in names or self.checkpoints:
+      self.get(name)
+
+  def unload(self, name):
+    with self._locks[name]:
+      self.models.pop(name, None)
+      self.runtimes.pop(name, None)
+
+CLASSIFIERS = ClassifierManager({'sms': SMS_MODEL_PATH, 'call': CALL_MODEL_PATH})
+
+@lru_cache(maxsize=None)
+def model_version(path):
+  """Short content hash of a checkpoint, so cached scores follow the weights"""
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 20), b''):
+      digest.update(block)
+  return f"{os.path.basename(path)}:{digest.hexdigest()[:16]}"
+
+def models_ready(name=None):
+  """Whether the named classifier, or every classifier, is loaded"""
+  if name is not None:
+    return CLASSIFIERS.is_loaded(name)
+  return all(CLASSIFIERS.is_loaded(name) for name in CLASSIFIERS.checkpoints)
+
+def prepare(model, device='cpu'):
+  """Put a model in eval mode on device, once rather than on every prediction"""
+  if _prepared.get(model) != device:
     model.eval()
-    text = text.replace("Input:", "Speaker 1:")
-    text = text.replace("Output:", "Speaker 2:")
-    encoding = tokenizer(text, return_tensors='pt', max_length=max_length, padding='max_length', truncation=True)
-    input_ids = encoding['input_ids'].to(device)
-    attention_mask = encoding['attention_mask'].to(device)
+    model.to(device)
+    _prepared[model] = device
+  return model
+
+def predict_batch(texts, model, tokenizer, device='cpu', max_length=512, batch_size=32):
+    """Probability of class 0 for each text, in the order given
+
+    Texts are tokenized without padding and sorted by length, so each batch of
+    batch_size similar-length texts is only padded to its own longest item.
+    """
+    if not texts:
+        return []
+    prepare(model, device)
+    input_ids = tokenizer(list(texts), max_length=max_length, truncation=True)['input_ids']
+    order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+    probabilities = [0.0] * len(texts)
 
     with torch.no_grad():
-      model.to(device)
-      outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-      outputs = torch.softmax(outputs, dim=1)
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            encoding = tokenizer.pad({'input_ids': [input_ids[i] for i in bucket]}, return_tensors='pt')
+            # Positional, exported graphs don't take keyword arguments
+            outputs = model(encoding['input_ids'].to(device), encoding['attention_mask'].to(device))
+            outputs = torch.softmax(outputs, dim=1)
+            for i, probability in zip(bucket, outputs[:, 0].tolist()):
+                probabilities[i] = probability
+    return probabilities
+
+def predict_labels(texts, model=None, tokenizer=None, device='cpu', max_length=512, batch_size=32):
+    model = CLASSIFIERS.get('sms') if model is None else model
+    tokenizer = CLASSIFIERS.get_tokenizer() if tokenizer is None else tokenizer
+    with COMPUTE.run('sms_scoring'):
+        return predict_batch(texts, model, tokenizer, device, max_length, batch_size)
+
+def predict_call_spams(texts, model=None, tokenizer=None, device='cpu', max_length=512, batch_size=32):
+    model = CLASSIFIERS.get('call') if model is None else model
+    tokenizer = CLASSIFIERS.get_tokenizer() if tokenizer is None else tokenizer
+    texts = [text.replace("Input:", "Speaker 1:").replace("Output:", "Speaker 2:") for text in texts]
+    with COMPUTE.run('call_scoring'):
+        return predict_batch(texts, model, tokenizer, device, max_length, batch_size)
+
+def predict_label(text, model=None, tokenizer=None, device='cpu', max_length=512, k=1):
+    return predict_labels([text], model, tokenizer, device, max_length)[0]
+
+def predict_call_spam(text, model=None, tokenizer=None, device='cpu', max_length=512, k=1):
+    start = time.time()
+    probability = predict_call_spams([text], model, tokenizer, device, max_length)[0]
     end = time.time()
     print(f"Time taken: {end - start}")
-    return float(outputs[0][0])
+    return probability
 
 # print("Done")
 # print(predict_label('Hii! How are you doing today?'))
@@ -0,0 +1,102 @@
+import threading
+import time
+
+class ModelEntry:
+    def __init__(self, name):
+        self.name = name
+        self.model = None
+        self.refs = 0
+        self.load_time = None
+        self.resident_bytes = 0
+        self.last_used = None
+        self.lock = threading.Lock()
+        self.inference_lock = threading.Lock()
+
+def model_bytes(model):
+    """Bytes held by a torch module's parameters and buffers, 0 for anything else"""
+    total = 0
+    for attr in ('parameters', 'buffers'):
+        tensors = getattr(model, attr, None)
+        if callable(tensors):
+            total += sum(t.numel() * t.element_size() for t in tensors())
+    return total
+
+class ModelRegistry:
+    """Process-wide cache of loaded models shared by reference count
+
+    acquire(name) loads the model with loader(name) the first time it is asked
+    for and returns the same instance to every later caller. Each acquire must be
+    paired with a release. Models nobody holds stay cached until evicted.
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = ModelEntry(name)
+            return entry
+
+    def acquire(self, name, loader=None):
+        entry = self._entry(name)
+        # Loading happens under the entry's lock so concurrent callers wait for one load
+        with entry.lock:
+            if entry.model is None:
+                start = time.time()
+                entry.model = (loader or self.loader)(name)
+                entry.load_time = time.time() - start
+                entry.resident_bytes = model_bytes(entry.model)
+                print(f"Loaded model {name} in {entry.load_time:.2f} seconds "
+                      f"({entry.resident_bytes / 2**20:.1f} MB)")
+            entry.refs += 1
+            entry.last_used = time.time()
+            return entry.model
+
+    def inference_lock(self, name):
+        """Lock to hold while running a shared model that is not safe to call concurrently"""
+        return self._entry(name).inference_lock
+
+    def release(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            return
+        with entry.lock:
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_used = time.time()
+
+    def evict(self, name):
+        """Drop a cached model if nobody holds it, returns True if it was evicted"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return False
+            with entry.lock:
+                if entry.refs > 0:
+                    return False
+                del self._entries[name]
+                entry.model = None
+        return True
+
+    def evict_unused(self, idle_seconds=0):
+        now = time.time()
+        with self._lock:
+            names = [name for name, entry in self._entries.items()
+                     if entry.refs == 0 and (entry.last_used is None or now - entry.last_used >= idle_seconds)]
+        return [name for name in names if self.evict(name)]
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            entry.name: {
+                'loaded': entry.model is not None,
+                'refs': entry.refs,
+                'load_time_s': entry.load_time,
+                'resident_mb': entry.resident_bytes / 2**20,
+            }
+            for entry in entries
+        }
@@ -0,0 +1,91 @@
+from functools import lru_cache
+from math import gcd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+@lru_cache(maxsize=None)
+def polyphase_filter(up, down, zero_crossings=16, beta=8.0):
+    """Kaiser-windowed sinc low-pass split into up phases
+
+    Row p holds the taps used for outputs that land on phase p of the upsampled
+    grid, reversed so a row can be dotted directly with an ascending window of
+    input samples.
+    """
+    taps_per_phase = 2 * zero_crossings * max(1, -(-down // up))
+    length = up * taps_per_phase
+    cutoff = 0.475 / max(up, down)  # cycles per upsampled sample, just under Nyquist
+    n = np.arange(length) - (length - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta) * up
+    phases = taps.reshape(taps_per_phase, up).T
+    return np.ascontiguousarray(phases[:, ::-1], dtype=np.float32)
+
+# Precompute the ratios the call pipeline uses
+for _in_rate, _out_rate in [(8000, 16000), (44100, 16000), (48000, 16000)]:
+    _g = gcd(_in_rate, _out_rate)
+    polyphase_filter(_out_rate // _g, _in_rate // _g)
+
+class StreamingResampler:
+    """Rational-ratio resampler that keeps filter state between chunks
+
+    Feeding a signal in chunks gives the same output as feeding it in one go, so
+    there are no edge artifacts at chunk boundaries. Output is float32 in the
+    input's units and is delayed by half the filter length.
+    """
+    def __init__(self, in_rate, out_rate):
+        g = gcd(int(in_rate), int(out_rate))
+        self.up = int(out_rate) // g
+        self.down = int(in_rate) // g
+        self.phases = polyphase_filter(self.up, self.down)
+        self.taps = self.phases.shape[1]
+
+        self._buffer = np.zeros(self.taps - 1 + 4096, dtype=np.float32)
+        self._consumed = 0  # input samples seen before the current chunk
+        self._next_output = 0
+
+    def output_length(self, input_length):
+        """Number of samples process() will return for the next input_length samples"""
+        end = ((self._consumed + input_length) * self.up + self.down - 1) // self.down
+        return end - self._next_output
+
+    def process(self, samples, out=None):
+        samples = samples.reshape(-1)
+        count = len(samples)
+        history = self.taps - 1
+        if len(self._buffer) < history + count:
+            grown = np.zeros(history + 2 * count, dtype=np.float32)
+            grown[:history] = self._buffer[:history]
+            self._buffer = grown
+        self._buffer[history:history + count] = samples
+
+        outputs = self.output_length(count)
+        if out is None:
+            out = np.empty(outputs, dtype=np.float32)
+        else:
+            out = out[:outputs]
+
+        buffer = self._buffer[:history + count]
+        windows = sliding_window_view(buffer, self.taps)
+        # Outputs r, r + up, r + 2 * up, ... share a filter phase and step through
+        # the input down samples at a time
+        for r in range(min(self.up, outputs)):
+            position = (self._next_output + r) * self.down
+            phase = position % self.up
+            start = position // self.up - self._consumed
+            n = len(range(r, outputs, self.up))
+            if self.down == 1:
+                # Consecutive windows, a direct correlation avoids gathering them
+                out[r::self.up] = np.correlate(buffer[start:start + n + self.taps - 1],
+                                               self.phases[phase], 'valid')
+            else:
+                out[r::self.up] = windows[start:start + n * self.down:self.down] @ self.phases[phase]
+
+        self._next_output += outputs
+        self._consumed += count
+        # Keep the last taps - 1 samples as history for the next chunk
+        self._buffer[:history] = self._buffer[count:count + history]
+        return out
+
+    def reset(self):
+        self._buffer[:] = 0
+        self._consumed = 0
+        self._next_output = 0
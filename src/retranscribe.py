@@ -0,0 +1,175 @@
+"""Re-transcribe archived call recordings with a chosen model
+
+Run from the repository root with, for example:
+    python -m src.retranscribe --since 03-01 --until 03-31 --model small.en --processes 4
+
+Every mic_recording.wav and output.wav under outputs/phone_calls/<MM-DD@HH-MM>_from_<number>
+gets a <name>.segments.json next to it with timestamped segments. Recordings whose
+segments file already matches their content hash, model and backend are skipped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+
+PHONE_CALL_DIR = "outputs/phone_calls"
+RECORDINGS = ('mic_recording.wav', 'output.wav')
+
+# Call directories and --since/--until have no year, parse them in a leap year so 02-29 works
+LEAP_YEAR = 2000
+
+_backend = None
+
+def month_day(text):
+    """Parse an MM-DD date"""
+    return datetime.strptime(f"{LEAP_YEAR}-{text}", "%Y-%m-%d")
+
+def call_date(directory):
+    """Date and time from a call directory name, None if it doesn't have one"""
+    try:
+        return datetime.strptime(f"{LEAP_YEAR}-" + os.path.basename(directory).split('_from_')[0],
+                                 "%Y-%m-%d@%H-%M")
+    except ValueError:
+        return None
+
+def find_recordings(root, since=None, until=None):
+    recordings = []
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+        if not os.path.isdir(directory):
+            continue
+        date = call_date(directory)
+        if (since or until) and date is None:
+            continue
+        if since and (date.month, date.day) < (since.month, since.day):
+            continue
+        if until and (date.month, date.day) > (until.month, until.day):
+            continue
+        for recording in RECORDINGS:
+            path = os.path.join(directory, recording)
+            if os.path.exists(path):
+                recordings.append(path)
+    return recordings
+
+def segments_path(path):
+    return os.path.splitext(path)[0] + '.segments.json'
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_done(path, source_hash, backend, model_name):
+    try:
+        with open(segments_path(path)) as f:
+            existing = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (existing.get('source_sha256'), existing.get('backend'), existing.get('model')) == \
+        (source_hash, backend, model_name)
+
+def init_worker(backend, model_name, threads):
+    global _backend
+    from src.asr_backends import make_backend
+    from src.compute_budget import COMPUTE, WORKLOADS
+    # Several processes share the CPU, don't let each one claim every core. This is a
+    # separate batch job, its budget isn't coordinated with a running app's.
+    COMPUTE.configure(threads, dict(WORKLOADS, call_asr=1.0))
+    _backend = make_backend(backend, model_name).load()
+
+def transcribe_recording(path, source_hash):
+    from src.asr_backends import WHISPER_SAMPLERATE
+    from src.resampler import StreamingResampler
+
+    start = time.perf_counter()
+    with wave.open(path, 'rb') as wf:
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    audio_seconds = len(audio) / rate
+    if rate != WHISPER_SAMPLERATE:
+        audio = StreamingResampler(rate, WHISPER_SAMPLERATE).process(audio)
+    audio = (audio / 32768.0).astype(np.float32)
+
+    segments = _backend.transcribe_segments(audio) if len(audio) else []
+    result = {
+        'source': os.path.basename(path),
+        'source_sha256': source_hash,
+        'backend': _backend.name,
+        'model': _backend.model_name,
+        'audio_seconds': audio_seconds,
+        'transcribed_at': datetime.now().isoformat(timespec='seconds'),
+        'segments': [{'start': round(s, 2), 'end': round(e, 2), 'text': text} for s, e, text in segments],
+    }
+    with open(segments_path(path), 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    return audio_seconds, time.perf_counter() - start
+
+def run(root=PHONE_CALL_DIR, since=None, until=None, backend='whisper', model_name='base.en',
+        processes=None, force=False):
+    processes = processes or max(1, (os.cpu_count() or 2) // 2)
+    recordings = find_recordings(root, since, until)
+    jobs = []
+    for path in recordings:
+        source_hash = content_hash(path)
+        if force or not is_done(path, source_hash, backend, model_name):
+            jobs.append((path, source_hash))
+    print(f"{len(recordings)} recordings, {len(recordings) - len(jobs)} already done, "
+          f"transcribing {len(jobs)} with {backend} {model_name} on {processes} processes")
+    if not jobs:
+        return {'recordings': len(recordings), 'transcribed': 0}
+
+    started = time.perf_counter()
+    audio_seconds = 0.0
+    failed = 0
+    threads = max(1, (os.cpu_count() or 1) // processes)
+    with ProcessPoolExecutor(processes, initializer=init_worker,
+                             initargs=(backend, model_name, threads)) as pool:
+        futures = {pool.submit(transcribe_recording, path, source_hash): path for path, source_hash in jobs}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                seconds, elapsed = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Failed {path}: {e}")
+                continue
+            audio_seconds += seconds
+            print(f"{path}: {seconds:.0f} s of audio in {elapsed:.1f} s")
+    wall_seconds = time.perf_counter() - started
+
+    report = {
+        'recordings': len(recordings),
+        'transcribed': len(jobs) - failed,
+        'failed': failed,
+        'audio_hours': audio_seconds / 3600,
+        'wall_seconds': wall_seconds,
+        'audio_hours_per_hour': audio_seconds / wall_seconds if wall_seconds else 0.0,
+    }
+    print(f"Transcribed {report['audio_hours']:.2f} hours of audio in {wall_seconds / 60:.1f} minutes, "
+          f"{report['audio_hours_per_hour']:.1f} audio-hours per hour")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-transcribe archived call recordings")
+    parser.add_argument('--root', default=PHONE_CALL_DIR)
+    parser.add_argument('--since', type=month_day, help="first day, MM-DD")
+    parser.add_argument('--until', type=month_day, help="last day, MM-DD")
+    parser.add_argument('--backend', default='whisper', help="whisper or whisper-int8")
+    parser.add_argument('--model', default='base.en')
+    parser.add_argument('--processes', type=int, help="worker processes, defaults to half the cores")
+    parser.add_argument('--force', action='store_true', help="re-transcribe recordings that are already done")
+    args = parser.parse_args()
+    run(args.root, args.since, args.until, args.backend, args.model, args.processes, args.force)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import numpy as np
+
+class AudioRing:
+    """Preallocated int16 ring buffer for one writer thread and one reader thread
+
+    write() copies samples into place. read() returns a view, not a copy, so it
+    must be used before the writer laps it. The first max_read samples are
+    mirrored after the end of the storage so a read that wraps around is still
+    one contiguous view. Writes that don't fit are rejected and counted in
+    overruns.
+    """
+    def __init__(self, capacity, max_read=None):
+        self.capacity = int(capacity)
+        self.max_read = min(int(max_read or capacity), self.capacity)
+        self.buffer = np.zeros(self.capacity + self.max_read, dtype=np.int16)
+        self.write_index = 0
+        self.read_index = 0
+        self.overruns = 0
+
+    def available(self):
+        return self.write_index - self.read_index
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write(self, samples):
+        """Copy samples in, returns False without writing if they don't fit"""
+        samples = samples.reshape(-1)
+        n = len(samples)
+        if n > self.free():
+            self.overruns += 1
+            return False
+        start = self.write_index % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        self.buffer[:n - first] = samples[first:]
+        # Keep the mirror of the first max_read samples in step
+        for a, b in ((start, start + first), (0, n - first)):
+            b = min(b, self.max_read)
+            if a < b:
+                self.buffer[self.capacity + a:self.capacity + b] = self.buffer[a:b]
+        self.write_index += n
+        return True
+
+    def peek(self, n):
+        """View of the next n unread samples without consuming them"""
+        if n > self.available() or n > self.max_read:
+            raise ValueError(f"Can't read {n} samples, {self.available()} available")
+        start = self.read_index % self.capacity
+        return self.buffer[start:start + n]
+
+    def advance(self, n):
+        self.read_index += min(n, self.available())
+
+    def read(self, n):
+        view = self.peek(n)
+        self.read_index += n
+        return view
+
+    def clear(self):
+        self.read_index = self.write_index
+
+class RecordingBuffer:
+    """Append-only int16 recording stored in fixed-size preallocated blocks
+
+    Memory grows one block at a time (a minute at 8kHz by default) instead of
+    one small array per frame, and samples are never moved once written, so
+    views returned by reserve() stay valid for the life of the recording.
+    """
+    def __init__(self, block_samples=8000 * 60):
+        self.block_samples = block_samples
+        self.blocks = []  # [array, samples used]
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def reserve(self, n):
+        """Writable view of the next n samples, counted as recorded"""
+        if not self.blocks or len(self.blocks[-1][0]) - self.blocks[-1][1] < n:
+            self.blocks.append([np.empty(max(n, self.block_samples), dtype=np.int16), 0])
+        block = self.blocks[-1]
+        view = block[0][block[1]:block[1] + n]
+        block[1] += n
+        self.length += n
+        return view
+
+    def write(self, samples):
+        samples = samples.reshape(-1)
+        self.reserve(len(samples))[:] = samples
+
+    def extend(self, other):
+        """Take over the blocks of another recording, leaving it empty"""
+        self.blocks.extend(other.blocks)
+        self.length += other.length
+        other.blocks, other.length = [], 0
+
+    def views(self):
+        return [block[:used] for block, used in self.blocks if used]
+
+    def array(self):
+        return np.concatenate(self.views()) if self.blocks else np.zeros(0, dtype=np.int16)
+
+    def write_wave(self, wf):
+        """Write the recording to an open wave file one block at a time"""
+        for view in self.views():
+            wf.writeframes(view.tobytes())
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+SCORE_CACHE_PATH = "outputs/spam_scores.sqlite3"
+# SQLite's default limit on variables in one statement is 999
+QUERY_CHUNK = 500
+
+def text_hash(text):
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+
+class ScoreCache:
+    """Persistent spam scores keyed by message text hash and model version
+
+    A new model version never sees scores from an old one, so retraining or
+    swapping a checkpoint only costs a re-score of the messages opened after it.
+    """
+    def __init__(self, path=SCORE_CACHE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "text_hash TEXT, model_version TEXT, score REAL, "
+                "PRIMARY KEY (text_hash, model_version)) WITHOUT ROWID")
+
+    def get_many(self, texts, model_version):
+        """Cached scores for the texts that have one, as a dict of text to score"""
+        hashes = {text_hash(text): text for text in texts}
+        found = {}
+        keys = list(hashes)
+        with self.lock:
+            for start in range(0, len(keys), QUERY_CHUNK):
+                chunk = keys[start:start + QUERY_CHUNK]
+                rows = self.conn.execute(
+                    f"SELECT text_hash, score FROM scores WHERE model_version = ? "
+                    f"AND text_hash IN ({','.join('?' * len(chunk))})", [model_version, *chunk])
+                for key, score in rows:
+                    found[hashes[key]] = score
+        return found
+
+    def put_many(self, scores, model_version):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores (text_hash, model_version, score) VALUES (?, ?, ?)",
+                [(text_hash(text), model_version, score) for text, score in scores.items()])
+
+    def scores(self, texts, model_version, score_missing=None):
+        """Scores in the order of texts
+
+        Texts without a cached score are scored in one call to score_missing and
+        stored, or get None when score_missing is None.
+        """
+        cached = self.get_many(texts, model_version)
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing and score_missing is not None:
+            scored = dict(zip(missing, score_missing(missing)))
+            self.put_many(scored, model_version)
+            cached.update(scored)
+        return [cached.get(text) for text in texts]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScoreCache()
+    return _cache
+
+def sms_spam_scores(texts, infer=True):
+    """SMS spam probabilities from the cache, scoring the rest when infer is True
+
+    Scoring goes through the shared classification service, so messages scored
+    from several threads at once share batched forward passes.
+    """
+    from src.model import CLASSIFIERS
+    from src.classification_service import get_service
+    score_missing = (lambda missing: get_service().scores('sms', missing)) if infer else None
+    return get_cache().scores(texts, CLASSIFIERS.version('sms'), score_missing)
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from PyQt6.QtCore import QObject, pyqtSignal
+
+class StartupTask:
+    def __init__(self, name, load, warmup=None, requires=()):
+        self.name = name
+        self.load = load
+        self.warmup = warmup
+        self.requires = tuple(requires)
+        self.state = 'pending'  # pending, loading, ready or failed
+        self.error = None
+        self.done = threading.Event()
+
+class StartupOrchestrator(QObject):
+    """Loads and warms models on background threads once the window is up
+
+    Each task loads one feature's models and optionally runs a dummy inference.
+    feature_ready is emitted with the task name when it finishes, so the window
+    can enable that feature, and feature_failed if it raised. Every step is
+    recorded with the seconds since the orchestrator was created.
+    """
+    feature_ready = pyqtSignal(str)
+    feature_failed = pyqtSignal(str, str)
+    all_done = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.started = time.perf_counter()
+        self.tasks = {}
+        self.events = []
+        self.lock = threading.Lock()
+        self.completed = False
+
+    def mark(self, event):
+        elapsed = time.perf_counter() - self.started
+        with self.lock:
+            self.events.append((elapsed, event))
+        print(f"[startup {elapsed:7.2f}s] {event}")
+
+    def add(self, name, load, warmup=None, requires=()):
+        self.tasks[name] = StartupTask(name, load, warmup, requires)
+
+    def start(self):
+        for task in self.tasks.values():
+            threading.Thread(target=self.run, args=(task,), daemon=True).start()
+
+    def run(self, task):
+        try:
+            for name in task.requires:
+                self.tasks[name].done.wait()
+                if self.tasks[name].state != 'ready':
+                    raise RuntimeError(f"{name} failed to load")
+            task.state = 'loading'
+            self.mark(f"{task.name} loading")
+            task.load()
+            self.mark(f"{task.name} loaded")
+            if task.warmup is not None:
+                task.warmup()
+                self.mark(f"{task.name} warmed up")
+        except Exception as e:
+            task.state = 'failed'
+            task.error = str(e)
+            self.mark(f"{task.name} failed: {e}")
+            self.feature_failed.emit(task.name, task.error)
+        else:
+            task.state = 'ready'
+            self.feature_ready.emit(task.name)
+        finally:
+            task.done.set()
+            with self.lock:
+                finished = not self.completed and all(t.done.is_set() for t in self.tasks.values())
+                self.completed = self.completed or finished
+            if finished:
+                self.mark("startup complete")
+                self.all_done.emit()
+
+    def is_ready(self, name):
+        task = self.tasks.get(name)
+        return task is not None and task.state == 'ready'
+
+    def states(self):
+        return {name: task.state for name, task in self.tasks.items()}
+
+    def timeline(self):
+        with self.lock:
+            return [{'seconds': round(seconds, 3), 'event': event} for seconds, event in self.events]
+
+    def write_timeline(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.timeline(), f, indent=2)
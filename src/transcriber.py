@@ -1,74 +1,431 @@
+import collections
+import difflib
 import threading
 import queue
 import numpy as np
-import whisper
 import time
-from scipy import signal
+from src.asr_backends import WHISPER_MODEL, WHISPER_SAMPLERATE, SMALLER_MODELS, make_backend
+from src.vad import SpeechSegmenter, make_vad
+from src.resampler import StreamingResampler
+from src.ring_buffer import AudioRing
 
 # Model constants and configuration
-WHISPER_MODEL = "base.en"
-WHISPER_SAMPLERATE = 16000
 TWILIO_SAMPLERATE = 8000
+SILENCE_LEVEL = 1000  # int16 peak below which a chunk counts as silence
+
+def normalize_word(word):
+    return word.strip(".,!?;:\"'").lower()
 
 class Transcriber:
-    def __init__(self, transcription_ready, input_samplerate=None):
-        self.model = whisper.load_model(WHISPER_MODEL)
-        self.audio_queue = queue.Queue()
+    def __init__(self, transcription_ready, input_samplerate=None, model_name=WHISPER_MODEL,
+                 scheduler=None, vad='energy', streaming=False, partial_ready=None,
+                 step_seconds=1.0, prompt_chars=200, backend='whisper', max_queue_seconds=10.0,
+                 overload=('grow', 'drop_silence'), max_window_seconds=30.0):
+        self.model_name = model_name
+        # With a scheduler, windows are decoded in batches with other transcribers
+        # on the scheduler's backend. Streaming re-decodes the utterance as it grows,
+        # so it always decodes directly.
+        self.scheduler = None if streaming else scheduler
+        self.backend = make_backend(backend, model_name)
+        if self.scheduler is None:
+            self.backend.load()
         self.should_stop = False
         self.transcription_ready = transcription_ready
         self.input_samplerate = input_samplerate or TWILIO_SAMPLERATE
+        # Audio is resampled to Whisper's rate as it is dequeued, as one continuous stream
+        self.resampler = None
+        if self.input_samplerate != WHISPER_SAMPLERATE:
+            self.resampler = StreamingResampler(self.input_samplerate, WHISPER_SAMPLERATE)
+        # Cut audio at speech boundaries, or into fixed 2 second windows when vad is None
+        self.segmenter = SpeechSegmenter(make_vad(vad, WHISPER_SAMPLERATE)) if vad else None
+
+        # Streaming mode emits partial hypotheses on partial_ready and commits words
+        # to transcription_ready once two consecutive decodes agree on them
+        self.streaming = streaming
+        if streaming and self.segmenter is None:
+            raise ValueError("Streaming transcription needs a VAD")
+        self.partial_ready = partial_ready
+        self.step_samples = int(WHISPER_SAMPLERATE * step_seconds)
+        self.prompt_chars = prompt_chars
+        self.committed_text = ""
+        # Words of the current utterance already committed, and the uncommitted
+        # words of the previous decode that the next one has to agree with
+        self.utterance_words = []
+        self.previous_words = []
+        self.utterance_prompt = None
+        self.utterance_started = None
+        self.first_word_emitted = False
+        self.last_commit = None
+        self.latency = {'first_word': [0, 0.0], 'final_word': [0, 0.0]}
+
+        # Incoming audio is written into a preallocated ring and audio_chunks holds
+        # [arrival time, samples, silent, skipped] for each chunk in it. When
+        # inference falls behind, the overload policies kick in: 'grow' decodes
+        # longer windows, 'drop_silence' skips silent chunks before speech once the
+        # queue is full, 'fallback' switches to a smaller model. The oldest audio is
+        # dropped if the queue is still over max_queue_seconds.
+        self.audio_chunks = collections.deque()
+        self.queue_ready = threading.Condition()
+        self.queued_samples = 0
+        self.max_queue_samples = int(self.input_samplerate * max_queue_seconds)
+        self.max_chunk = self.input_samplerate // 10
+        # Skipped silence stays in the ring until it is read past, so leave room for it
+        self.audio_ring = AudioRing(2 * self.max_queue_samples + self.max_chunk, self.max_chunk)
+        self.high_water = max_queue_seconds / 2
+        self.low_water = 1.0
+        self.overload = set(overload)
+        self.base_window_seconds = 2.0
+        self.window_seconds = self.base_window_seconds
+        self.max_window_seconds = max_window_seconds
+        self.last_arrival = None
+        self.lag_seconds = 0.0
+        self.dropped_samples = 0
+        self.dropped_silence_samples = 0
+        self.shedding = False
+        self.adapted_at = 0.0
+
+        # Fixed windows are resampled straight into one reusable buffer
+        self.window_buffer = np.zeros(int(WHISPER_SAMPLERATE * max_window_seconds)
+                                      + 2 * WHISPER_SAMPLERATE // 10 + 2, dtype=np.float32)
         
         # Start transcription thread
         self.transcription_thread = threading.Thread(target=self.transcription_worker, daemon=True)
         self.transcription_thread.start()
     
     def queue_audio(self, audio_data):
-        self.audio_queue.put(audio_data.copy())
-    
+        samples = audio_data.reshape(-1)
+        silent = len(samples) == 0 or int(np.abs(samples).max()) < SILENCE_LEVEL
+        arrival = time.time()
+        with self.queue_ready:
+            for start in range(0, len(samples), self.max_chunk):
+                part = samples[start:start + self.max_chunk]
+                while not self.audio_ring.write(part):
+                    self.drop_oldest()
+                self.audio_chunks.append([arrival, len(part), silent, False])
+                self.queued_samples += len(part)
+            if self.queued_samples > self.max_queue_samples:
+                self.shed_load()
+            self.queue_ready.notify()
+
+    def drop_oldest(self):
+        _, samples, _, skipped = self.audio_chunks.popleft()
+        self.audio_ring.advance(samples)
+        if not skipped:
+            self.queued_samples -= samples
+            self.dropped_samples += samples
+
+    def shed_load(self):
+        """Bring the queue back under its bound, called with queue_ready held"""
+        if not self.shedding:
+            self.shedding = True
+            print(f"Transcription is {self.backlog_seconds():.1f} seconds behind, dropping audio")
+        if 'drop_silence' in self.overload:
+            for chunk in self.audio_chunks:
+                if self.queued_samples <= self.max_queue_samples:
+                    break
+                if chunk[2] and not chunk[3]:
+                    chunk[3] = True
+                    self.queued_samples -= chunk[1]
+                    self.dropped_silence_samples += chunk[1]
+        while self.queued_samples > self.max_queue_samples and len(self.audio_chunks) > 1:
+            self.drop_oldest()
+
+    def next_chunk(self, timeout, out=None):
+        """Dequeue the next chunk as float32 at WHISPER_SAMPLERATE, raises queue.Empty
+
+        The ring is read in place, so resampling into out (or a new array) happens
+        before the chunk's space is handed back to the writer.
+        """
+        with self.queue_ready:
+            if not self.queue_ready.wait_for(lambda: self.queued_samples > 0, timeout):
+                raise queue.Empty
+            while self.audio_chunks[0][3]:
+                self.audio_ring.advance(self.audio_chunks.popleft()[1])
+            self.last_arrival, samples, _, _ = self.audio_chunks.popleft()
+            self.queued_samples -= samples
+            chunk = self.audio_ring.peek(samples)
+            if self.resampler is not None:
+                chunk = self.resampler.process(chunk, out)
+            elif out is not None:
+                out[:samples] = chunk
+                chunk = out[:samples]
+            else:
+                chunk = chunk.astype(np.float32)
+            self.audio_ring.advance(samples)
+        return chunk
+
     def transcription_worker(self):
+        if self.streaming:
+            return self.streaming_worker()
         while not self.should_stop:
-            audio_chunks = []
-            timeout_counter = 0
-            
-            # Collect chunks for 2 seconds worth of audio
-            target_samples = int(self.input_samplerate * 2)
-            collected_samples = 0
-            
-            while collected_samples < target_samples and timeout_counter < 20:
+            self.adapt()
+            for audio_data in self.next_windows():
+                self.transcribe(audio_data)
+
+    def next_windows(self):
+        """Wait for the next audio worth transcribing"""
+        if self.segmenter is None:
+            return self.fixed_window()
+
+        try:
+            chunk = self.next_chunk(timeout=0.5)
+        except queue.Empty:
+            # The stream has gone quiet, don't hold on to buffered speech
+            segment = self.segmenter.flush()
+            return [segment] if segment is not None else []
+        segments = self.segmenter.push(chunk)
+
+        # When behind, take what is already queued and decode its speech in fewer,
+        # longer windows
+        if self.window_seconds > self.base_window_seconds:
+            budget = int(self.window_seconds * WHISPER_SAMPLERATE)
+            taken = len(chunk)
+            while taken < budget:
                 try:
-                    chunk = self.audio_queue.get(timeout=0.1)
-                    audio_chunks.append(chunk)
-                    collected_samples += len(chunk)
+                    chunk = self.next_chunk(timeout=0)
                 except queue.Empty:
-                    timeout_counter += 1
-                    continue
-            
-            if audio_chunks:
-                audio_data = np.concatenate(audio_chunks)
-                
-                # Resample if needed
-                if self.input_samplerate != WHISPER_SAMPLERATE:
-                    samples = len(audio_data)
-                    new_samples = int(samples * WHISPER_SAMPLERATE / self.input_samplerate)
-                    audio_data = signal.resample(audio_data, new_samples)
-                
-                audio_data = audio_data.astype(np.float32)
-                audio_data = audio_data.flatten()
-                max_amplitude = np.max(audio_data)
-                
-                if max_amplitude > 1000:
-                    audio_data = audio_data / max_amplitude
-                    start = time.time()
-                    result = self.model.transcribe(
-                        audio_data,
-                        language='en',
-                        fp16=False,
-                        condition_on_previous_text=False,
-                        without_timestamps=True,
-                    )
-                    if result["text"].strip():
-                        print(f"Transcribed text: {result['text']} in {time.time() - start:.2f} seconds")
-                        self.transcription_ready.emit(result["text"])
-    
+                    break
+                taken += len(chunk)
+                segments.extend(self.segmenter.push(chunk))
+            segments = self.merge(segments, budget)
+        return segments
+
+    def merge(self, segments, max_samples):
+        windows = []
+        for segment in segments:
+            if windows and len(windows[-1]) + len(segment) <= max_samples:
+                windows[-1] = np.concatenate([windows[-1], segment])
+            else:
+                windows.append(segment)
+        return windows
+
+    def fixed_window(self):
+        timeout_counter = 0
+        
+        # Collect chunks for 2 seconds worth of audio, or more when behind
+        target_samples = int(WHISPER_SAMPLERATE * self.window_seconds)
+        collected_samples = 0
+        
+        while collected_samples < target_samples and timeout_counter < 20:
+            try:
+                chunk = self.next_chunk(timeout=0.1, out=self.window_buffer[collected_samples:])
+                collected_samples += len(chunk)
+            except queue.Empty:
+                timeout_counter += 1
+                continue
+
+        if not collected_samples:
+            return []
+        # A view of the reusable buffer, prepare() copies it before it is decoded
+        audio_data = self.window_buffer[:collected_samples]
+        if np.max(audio_data) <= 1000:
+            return []
+        return [audio_data]
+
+    def prepare(self, audio_data):
+        """Peak-normalise already resampled audio, None for silence"""
+        audio_data = audio_data.astype(np.float32, copy=False).reshape(-1)
+        max_amplitude = np.max(np.abs(audio_data))
+        if max_amplitude == 0:
+            return None
+        return audio_data / max_amplitude
+
+    def decode(self, audio_data, prompt=None):
+        return self.backend.transcribe(audio_data, prompt)
+
+    def transcribe(self, audio_data):
+        audio_data = self.prepare(audio_data)
+        if audio_data is None:
+            return
+
+        arrival = self.last_arrival
+        if self.scheduler is not None:
+            self.scheduler.submit(audio_data, lambda text: self.emit_text(text, arrival))
+            return
+        start = time.time()
+        text = self.decode(audio_data)
+        self.record_lag(arrival)
+        if text.strip():
+            print(f"Transcribed text: {text} in {time.time() - start:.2f} seconds")
+            self.transcription_ready.emit(text)
+
+    def streaming_worker(self):
+        pending_samples = 0
+        while not self.should_stop:
+            self.adapt()
+            try:
+                chunk = self.next_chunk(timeout=0.5)
+            except queue.Empty:
+                segment = self.segmenter.flush()
+                if segment is not None:
+                    self.finish_utterance(segment)
+                continue
+
+            for segment in self.segmenter.push(chunk):
+                self.finish_utterance(segment)
+                pending_samples = 0
+
+            if not self.segmenter.in_speech:
+                continue
+            if self.utterance_started is None:
+                self.utterance_started = time.time()
+                # Frozen for the utterance, so words committed from it never end up in its own prompt
+                self.utterance_prompt = self.prompt()
+            pending_samples += len(chunk)
+            if pending_samples >= self.step_samples:
+                pending_samples = 0
+                self.update_hypothesis(self.segmenter.current())
+
+    def prompt(self):
+        return self.committed_text[-self.prompt_chars:] or None
+
+    def current_prompt(self):
+        return self.utterance_prompt if self.utterance_started is not None else self.prompt()
+
+    def uncommitted(self, words):
+        """The words of a decode that come after what this utterance has already committed
+
+        Re-decoding can change or drop words that were already committed, so the
+        committed words are aligned against the decode instead of assuming they
+        are its first len(utterance_words) words.
+        """
+        if not self.utterance_words:
+            return words
+        matcher = difflib.SequenceMatcher(None, [normalize_word(word) for word in self.utterance_words],
+                                          [normalize_word(word) for word in words], autojunk=False)
+        end = None
+        for block in matcher.get_matching_blocks():
+            if block.size:
+                end = block.b + block.size
+        if end is None:
+            # Nothing lines up, fall back to skipping as many words as were committed
+            end = len(self.utterance_words)
+        return words[end:]
+
+    def update_hypothesis(self, audio_data):
+        """Re-decode the growing utterance and commit the new words two decodes agree on"""
+        audio_data = self.prepare(audio_data)
+        if audio_data is None:
+            return
+        words = self.decode(audio_data, self.current_prompt()).split()
+        self.record_lag(self.last_arrival)
+        pending = self.uncommitted(words)
+
+        agreed = 0
+        for previous, current in zip(self.previous_words, pending):
+            if normalize_word(previous) != normalize_word(current):
+                break
+            agreed += 1
+
+        if agreed:
+            self.commit(pending[:agreed])
+            self.utterance_words.extend(pending[:agreed])
+        self.previous_words = pending[agreed:]
+        if self.partial_ready is not None:
+            self.partial_ready.emit(" ".join(pending[agreed:]))
+        if words:
+            self.mark_first_word()
+
+    def finish_utterance(self, segment):
+        """Commit everything left in a completed segment and start a new utterance"""
+        ended = time.time()
+        audio_data = self.prepare(segment)
+        pending = []
+        if audio_data is not None:
+            words = self.decode(audio_data, self.current_prompt()).split()
+            self.record_lag(self.last_arrival)
+            pending = self.uncommitted(words)
+            if pending:
+                self.mark_first_word()
+                self.commit(pending)
+        if self.utterance_words or pending:
+            # Zero when the streaming decodes had already committed every word
+            self.record_latency('final_word', max(0.0, self.last_commit - ended))
+        if self.partial_ready is not None:
+            self.partial_ready.emit("")
+        self.utterance_words = []
+        self.previous_words = []
+        self.utterance_prompt = None
+        self.utterance_started = None
+        self.first_word_emitted = False
+
+    def commit(self, words):
+        text = " ".join(words)
+        self.last_commit = time.time()
+        self.committed_text = f"{self.committed_text} {text}".strip()[-self.prompt_chars:]
+        self.transcription_ready.emit(text)
+
+    def mark_first_word(self):
+        if not self.first_word_emitted and self.utterance_started is not None:
+            self.first_word_emitted = True
+            self.record_latency('first_word', time.time() - self.utterance_started)
+
+    def record_latency(self, name, seconds):
+        self.latency[name][0] += 1
+        self.latency[name][1] += seconds
+
+    def latency_stats(self):
+        """Mean seconds from speech start to the first word and from speech end to the last"""
+        return {name: total / count if count else None
+                for name, (count, total) in self.latency.items()}
+
+    def emit_text(self, text, arrival=None):
+        self.record_lag(arrival)
+        if text.strip():
+            self.transcription_ready.emit(text)
+
+    def backlog_seconds(self):
+        """Seconds of audio queued and not yet read by the transcription thread"""
+        return self.queued_samples / self.input_samplerate
+
+    def record_lag(self, arrival):
+        if arrival is not None:
+            self.lag_seconds = time.time() - arrival
+
+    def adapt(self):
+        """Apply the overload policies for the current backlog, at most once a second"""
+        now = time.time()
+        if now - self.adapted_at < 1.0:
+            return
+        self.adapted_at = now
+        backlog = self.backlog_seconds()
+        if backlog < self.low_water:
+            self.shedding = False
+        if 'grow' in self.overload:
+            if backlog > self.high_water and self.window_seconds < self.max_window_seconds:
+                self.window_seconds = min(self.max_window_seconds, self.window_seconds * 2)
+                print(f"Transcription is {backlog:.1f} seconds behind, "
+                      f"decoding {self.window_seconds:.0f} second windows")
+            elif backlog < self.low_water and self.window_seconds > self.base_window_seconds:
+                self.window_seconds = max(self.base_window_seconds, self.window_seconds / 2)
+        # Only a transcriber that decodes by itself can change model, the
+        # scheduler's backend is shared with other streams
+        if 'fallback' in self.overload and backlog > self.high_water and self.scheduler is None:
+            self.fall_back()
+            # Give the smaller model time to drain the backlog before stepping down again
+            self.adapted_at = time.time() + 10.0
+
+    def fall_back(self):
+        smaller = SMALLER_MODELS.get(self.backend.model_name)
+        if smaller is None:
+            return
+        print(f"Transcription is {self.backlog_seconds():.1f} seconds behind, "
+              f"switching from {self.backend.model_name} to {smaller}")
+        backend = make_backend(self.backend.name, smaller).load()
+        previous, self.backend = self.backend, backend
+        previous.release()
+
+    def stats(self):
+        return {
+            'backlog_s': self.backlog_seconds(),
+            'lag_s': self.lag_seconds,
+            'window_s': self.window_seconds,
+            'dropped_s': self.dropped_samples / self.input_samplerate,
+            'dropped_silence_s': self.dropped_silence_samples / self.input_samplerate,
+            'model': self.backend.model_name,
+        }
+
     def stop(self):
-        self.should_stop = True
+        if not self.should_stop:
+            self.should_stop = True
+            self.backend.release()
@@ -0,0 +1,245 @@
+import itertools
+import os
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+HEADER_BYTES = 16  # write index and read index, both int64
+
+class SharedAudioRing:
+    """Single-producer single-consumer int16 ring buffer in shared memory
+
+    The GUI process writes frames and advances the write index, a worker process
+    reads them and advances the read index. Both indices live in the block so a
+    restarted worker resumes where the previous one stopped.
+    """
+    def __init__(self, capacity=None, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + 2 * capacity)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.capacity = (self.shm.size - HEADER_BYTES) // 2
+        self.indices = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf[:HEADER_BYTES])
+        self.data = np.ndarray((self.capacity,), dtype=np.int16, buffer=self.shm.buf[HEADER_BYTES:])
+        if self.owner:
+            self.indices[:] = 0
+        self.overruns = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, samples):
+        samples = samples.reshape(-1)
+        n = len(samples)
+        write_index, read_index = int(self.indices[0]), int(self.indices[1])
+        if self.capacity - (write_index - read_index) < n:
+            self.overruns += 1
+            return False
+        start = write_index % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.indices[0] = write_index + n
+        return True
+
+    def read(self):
+        """Copy out everything written since the last read, or None"""
+        write_index, read_index = int(self.indices[0]), int(self.indices[1])
+        n = write_index - read_index
+        if n <= 0:
+            return None
+        start = read_index % self.capacity
+        first = min(n, self.capacity - start)
+        samples = np.concatenate([self.data[start:start + first], self.data[:n - first]])
+        self.indices[1] = read_index + n
+        return samples
+
+    def close(self):
+        del self.indices, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class ResultChannel:
+    """Stands in for a Qt signal inside a worker and forwards text to the GUI process"""
+    def __init__(self, results, stream_id, kind):
+        self.results = results
+        self.stream_id = stream_id
+        self.kind = kind
+
+    def emit(self, text):
+        self.results.put((self.stream_id, self.kind, text))
+
+def worker_main(commands, results, model_name, backend, cores):
+    """Entry point of a transcription process: feeds shared rings into Transcribers"""
+    from src.transcriber import Transcriber
+    from src.inference_scheduler import InferenceScheduler
+    from src.compute_budget import COMPUTE, WORKLOADS
+
+    # Only live ASR runs here, give it this process's share of the cores
+    COMPUTE.configure(cores, dict(WORKLOADS, call_asr=1.0))
+
+    scheduler = InferenceScheduler(model_name, backend=backend)
+    streams = {}
+    while True:
+        while True:
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                break
+            if command[0] == 'open':
+                _, stream_id, ring_name, options = command
+                transcriber = Transcriber(
+                    ResultChannel(results, stream_id, 'final'), model_name=model_name,
+                    scheduler=scheduler, backend=backend,
+                    partial_ready=ResultChannel(results, stream_id, 'partial'), **options)
+                streams[stream_id] = (SharedAudioRing(name=ring_name), transcriber)
+            elif command[0] == 'close':
+                ring, transcriber = streams.pop(command[1], (None, None))
+                if transcriber is not None:
+                    transcriber.stop()
+                    ring.close()
+            elif command[0] == 'exit':
+                return
+
+        for ring, transcriber in streams.values():
+            samples = ring.read()
+            if samples is not None:
+                transcriber.queue_audio(samples)
+        time.sleep(0.01)
+
+class PooledTranscriber:
+    """Transcriber stand-in whose audio is transcribed in a worker process"""
+    def __init__(self, pool, stream_id, worker, ring, transcription_ready, partial_ready, options):
+        self.pool = pool
+        self.stream_id = stream_id
+        self.worker = worker
+        self.ring = ring
+        self.transcription_ready = transcription_ready
+        self.partial_ready = partial_ready
+        self.options = options
+
+    def queue_audio(self, audio_data):
+        self.ring.write(audio_data)
+
+    def stop(self):
+        self.pool.close_stream(self)
+
+class TranscriptionPool:
+    """Runs Whisper transcription in worker processes instead of GUI-process threads
+
+    open_stream() returns an object with the Transcriber interface. Audio goes to
+    the stream's worker through a shared-memory ring, text comes back on one
+    result queue and is emitted on the stream's signals by a pump thread. A
+    worker that dies is restarted and its streams are reopened on the same rings.
+    Each worker gets worker_cores cores for ASR, see compute_budget.reserve_for_workers.
+    """
+    def __init__(self, processes=2, model_name=None, ring_seconds=30, backend='whisper', worker_cores=None):
+        from src.transcriber import WHISPER_MODEL, TWILIO_SAMPLERATE
+        self.model_name = model_name or WHISPER_MODEL
+        self.backend = backend
+        self.default_samplerate = TWILIO_SAMPLERATE
+        self.ring_seconds = ring_seconds
+        self.worker_cores = worker_cores or max(1, (os.cpu_count() or 1) // processes)
+        self.context = mp.get_context('spawn')
+        self.results = self.context.Queue()
+        self.workers = [None] * processes
+        self.commands = [None] * processes
+        self.streams = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.should_stop = False
+        self.restarts = 0
+
+        for index in range(processes):
+            self.start_worker(index)
+        threading.Thread(target=self.result_pump, daemon=True).start()
+        threading.Thread(target=self.monitor, daemon=True).start()
+
+    def start_worker(self, index):
+        self.commands[index] = self.context.Queue()
+        self.workers[index] = self.context.Process(
+            target=worker_main, args=(self.commands[index], self.results, self.model_name, self.backend,
+                                      self.worker_cores),
+            daemon=True)
+        self.workers[index].start()
+
+    def open_stream(self, transcription_ready, input_samplerate=None, partial_ready=None, **options):
+        # Workers batch their own streams, an in-process scheduler can't cross over
+        options.pop('scheduler', None)
+        if input_samplerate:
+            options['input_samplerate'] = input_samplerate
+        ring = SharedAudioRing(int((input_samplerate or self.default_samplerate) * self.ring_seconds))
+        with self.lock:
+            stream_id = next(self.ids)
+            worker = stream_id % len(self.workers)
+            stream = PooledTranscriber(self, stream_id, worker, ring,
+                                       transcription_ready, partial_ready, options)
+            self.streams[stream_id] = stream
+            self.commands[worker].put(('open', stream_id, stream.ring.name, options))
+        return stream
+
+    def close_stream(self, stream):
+        with self.lock:
+            if self.streams.pop(stream.stream_id, None) is None:
+                return
+            self.commands[stream.worker].put(('close', stream.stream_id))
+        # The worker maps the ring by name, give it a moment to let go
+        threading.Timer(1.0, stream.ring.close).start()
+
+    def result_pump(self):
+        while not self.should_stop:
+            try:
+                stream_id, kind, text = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            stream = self.streams.get(stream_id)
+            if stream is None:
+                continue
+            if kind == 'final' and text.strip():
+                stream.transcription_ready.emit(text)
+            elif kind == 'partial' and stream.partial_ready is not None:
+                stream.partial_ready.emit(text)
+
+    def monitor(self):
+        while not self.should_stop:
+            time.sleep(1)
+            for index, worker in enumerate(self.workers):
+                if self.should_stop or worker.is_alive():
+                    continue
+                print(f"Transcription worker {index} exited with code {worker.exitcode}, restarting")
+                with self.lock:
+                    self.restarts += 1
+                    self.start_worker(index)
+                    for stream in self.streams.values():
+                        if stream.worker == index:
+                            self.commands[index].put(('open', stream.stream_id, stream.ring.name,
+                                                      stream.options))
+
+    def stats(self):
+        with self.lock:
+            streams = list(self.streams.values())
+        return {
+            'workers_alive': sum(worker.is_alive() for worker in self.workers),
+            'restarts': self.restarts,
+            'streams': len(streams),
+            'ring_overruns': sum(stream.ring.overruns for stream in streams),
+        }
+
+    def shutdown(self):
+        self.should_stop = True
+        for commands in self.commands:
+            commands.put(('exit',))
+        for worker in self.workers:
+            worker.join(timeout=5)
+        with self.lock:
+            streams = list(self.streams.values())
+            self.streams.clear()
+        for stream in streams:
+            stream.ring.close()
@@ -0,0 +1,137 @@
+import collections
+import numpy as np
+
+class EnergyVAD:
+    """Marks frames as speech when their RMS clears an adaptive noise floor"""
+    def __init__(self, samplerate, frame_ms=20, min_rms=300.0, ratio=3.0, noise_decay=0.95):
+        self.samplerate = samplerate
+        self.frame_samples = int(samplerate * frame_ms / 1000)
+        self.min_rms = min_rms
+        self.ratio = ratio
+        self.noise_decay = noise_decay
+        self.noise_floor = min_rms / ratio
+
+    def is_speech(self, frame):
+        rms = float(np.sqrt(np.mean(np.square(frame, dtype=np.float32))))
+        speech = rms > max(self.min_rms, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor = self.noise_decay * self.noise_floor + (1 - self.noise_decay) * rms
+        return speech
+
+class SileroVAD:
+    """Silero VAD model from torch.hub, loaded on first use"""
+    def __init__(self, samplerate, threshold=0.5):
+        if samplerate not in (8000, 16000):
+            raise ValueError("Silero VAD supports 8kHz and 16kHz audio")
+        self.samplerate = samplerate
+        self.frame_samples = 256 if samplerate == 8000 else 512
+        self.threshold = threshold
+        self.model = None
+
+    def is_speech(self, frame):
+        import torch
+        if self.model is None:
+            self.model, _ = torch.hub.load('snakers4/silero-vad', 'silero_vad', trust_repo=True)
+        audio = torch.from_numpy(frame.astype(np.float32) / 32768.0)
+        with torch.no_grad():
+            probability = self.model(audio, self.samplerate).item()
+        return probability > self.threshold
+
+VADS = {'energy': EnergyVAD, 'silero': SileroVAD}
+
+def make_vad(vad, samplerate):
+    """Build a VAD from a name in VADS, or return an existing instance unchanged"""
+    if isinstance(vad, str):
+        return VADS[vad](samplerate)
+    return vad
+
+class SpeechSegmenter:
+    """Cuts a stream of int16 audio into speech segments using a VAD
+
+    A segment opens on the first speech frame (keeping pre_roll_ms of audio
+    before it) and closes after min_silence_ms without speech. Segments with
+    less than min_speech_ms of speech are discarded. A segment that reaches
+    max_segment_s is cut at its quietest frame in the last third, and the rest
+    carries over into the next segment.
+    """
+    def __init__(self, vad, min_silence_ms=400, min_speech_ms=250, max_segment_s=8.0,
+                 pre_roll_ms=200):
+        self.vad = vad
+        self.frame_samples = vad.frame_samples
+        frame_ms = 1000 * self.frame_samples / vad.samplerate
+        self.min_silence_frames = max(1, int(min_silence_ms / frame_ms))
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self.max_segment_frames = max(1, int(max_segment_s * 1000 / frame_ms))
+
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.pre_roll = collections.deque(maxlen=max(0, int(pre_roll_ms / frame_ms)))
+        self.frames = []
+        self.energies = []
+        self.speech_frames = 0
+        self.silence_run = 0
+
+    def push(self, audio):
+        """Add audio and return the list of segments it completed"""
+        audio = np.concatenate([self.pending, audio.reshape(-1)]) if len(self.pending) else audio.reshape(-1)
+        usable = len(audio) - len(audio) % self.frame_samples
+        self.pending = audio[usable:].copy()
+
+        segments = []
+        for start in range(0, usable, self.frame_samples):
+            segment = self._push_frame(audio[start:start + self.frame_samples])
+            if segment is not None:
+                segments.append(segment)
+        return segments
+
+    def _push_frame(self, frame):
+        speech = self.vad.is_speech(frame)
+        if not self.frames:
+            if not speech:
+                self.pre_roll.append(frame)
+                return None
+            self.frames = list(self.pre_roll)
+            self.energies = [float(np.abs(f).mean()) for f in self.frames]
+            self.pre_roll.clear()
+
+        self.frames.append(frame)
+        self.energies.append(float(np.abs(frame).mean()))
+        if speech:
+            self.speech_frames += 1
+            self.silence_run = 0
+        else:
+            self.silence_run += 1
+
+        if self.silence_run >= self.min_silence_frames:
+            return self._close(len(self.frames))
+        if len(self.frames) >= self.max_segment_frames:
+            tail = len(self.frames) * 2 // 3
+            cut = tail + int(np.argmin(self.energies[tail:])) + 1
+            return self._close(cut)
+        return None
+
+    def _close(self, cut):
+        frames, self.frames = self.frames[:cut], self.frames[cut:]
+        self.energies = self.energies[cut:]
+        speech_frames = self.speech_frames
+        # Frames carried over after a forced cut still belong to ongoing speech
+        self.speech_frames = len(self.frames)
+        self.silence_run = 0
+        if speech_frames < self.min_speech_frames:
+            return None
+        return np.concatenate(frames)
+
+    @property
+    def in_speech(self):
+        return bool(self.frames)
+
+    def current(self):
+        """The segment being built so far, or None outside speech"""
+        return np.concatenate(self.frames) if self.frames else None
+
+    def flush(self):
+        """Return whatever speech is buffered, e.g. when the stream goes quiet"""
+        if not self.frames:
+            return None
+        segment = self._close(len(self.frames))
+        self.frames, self.energies, self.speech_frames = [], [], 0
+        return segment